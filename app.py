@@ -4,8 +4,10 @@ st.set_page_config(page_title="Quiz Runner", layout="centered")
 from datetime import datetime
 from google.api_core.exceptions import ServiceUnavailable
 
-# ✅ Centralized Firebase setup
-from firebaseConfig import db
+# ✅ Centralized Firebase setup (client is shared process-wide and warmed once)
+from firebaseConfig import db, start_warm_up
+start_warm_up()
+from utils import firestore_metrics, repository
 
 # Utility modules
 from utils.auth import signup_user, login_user, get_user_info, send_password_reset
@@ -13,17 +15,32 @@ from utils.auth import signup_user, login_user, get_user_info, send_password_res
 # ✅ Safe Firestore call wrapper
 def safe_get_user_info(uid):
     try:
-        doc = db.collection('users').document(uid).get()
-        if doc.exists:
-            return doc.to_dict()
-        else:
-            return None
+        return repository.get_user(db, uid)
     except ServiceUnavailable as e:
         st.error("🚫 Cannot connect to Firestore. Please check your internet connection and try again.")
         print(f"[Firestore Error] {e}")
         return None
 
 
+def show_firestore_debug_panel(ledger):
+    # 🔥 Opt-in per-rerun Firestore cost panel (QUIZ_RUNNER_FIRESTORE_DEBUG=1)
+    totals = ledger.totals()
+    with st.sidebar.expander("🔥 Firestore usage (this rerun)"):
+        st.markdown(
+            f"**Reads:** {totals['reads']} · **Writes:** {totals['writes']} · "
+            f"**Deletes:** {totals['deletes']} · **Docs returned:** {totals['docs']}"
+        )
+        st.markdown(f"**Firestore time:** {totals['seconds'] * 1000:.0f} ms over {totals['calls']} calls")
+        rows = ledger.rows()
+        if rows:
+            # rows() returns copies, so each one can be reshaped in place
+            for row in rows:
+                row["ms"] = round(row.pop("seconds") * 1000, 1)
+            st.dataframe(rows, use_container_width=True)
+        cache = repository.cache_stats()
+        st.caption(f"Repository cache: {cache['hits']} hits / {cache['misses']} misses ({cache['size']} entries)")
+
+
 def main():
     # ✅ Restore session state from query params
     params = st.query_params
@@ -116,4 +133,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with firestore_metrics.render_ledger() as ledger:
+        main()
+        if ledger is not None:
+            show_firestore_debug_panel(ledger)
@@ -1,11 +1,63 @@
+import os
+import threading
 import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, firestore
+from utils import firestore_metrics
 
-# ✅ Initialize Firebase only once
-if not firebase_admin._apps:
-    cred = credentials.Certificate(dict(st.secrets["firebase"]))
-    firebase_admin.initialize_app(cred)
+# Used when no [firebase] section is present in Streamlit secrets
+SERVICE_ACCOUNT_PATH = os.getenv("FIREBASE_SERVICE_ACCOUNT", "serviceAccountKey.json")
 
-# ✅ Create and export Firestore client
-db = firestore.client()
+_client = None
+_client_lock = threading.Lock()
+_warm_up_started = False
+
+
+def _load_credentials():
+    # Streamlit secrets first (Cloud and .streamlit/secrets.toml), then a local key file
+    try:
+        return credentials.Certificate(dict(st.secrets["firebase"]))
+    except (KeyError, FileNotFoundError):
+        return credentials.Certificate(SERVICE_ACCOUNT_PATH)
+
+
+def get_db():
+    # ✅ One Firestore client per process, created on first use
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not firebase_admin._apps:
+                    firebase_admin.initialize_app(_load_credentials())
+                client = firestore.client()
+                # Per-rerun read/write accounting (QUIZ_RUNNER_FIRESTORE_DEBUG=1)
+                _client = firestore_metrics.instrument(client) if firestore_metrics.ENABLED else client
+    return _client
+
+
+def warm_up():
+    # A cheap read opens the gRPC channel so the first user action doesn't pay for it
+    try:
+        get_db().collection("users").limit(1).get()
+    except Exception as e:
+        print(f"[Firestore Warm-up] {e}")
+
+
+def start_warm_up():
+    # Warm the client once per process, in the background so startup isn't blocked
+    global _warm_up_started
+    with _client_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up, name="firestore-warm-up", daemon=True).start()
+
+
+class _LazyClient:
+    # Stand-in for the client so `from firebaseConfig import db` doesn't connect at import time
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
+# ✅ Shared Firestore client (initialized on first attribute access)
+db = _LazyClient()
@@ -1,14 +1,18 @@
+import os
 import streamlit as st
-from datetime import datetime, timezone
-import firebase_admin
-from firebase_admin import credentials, firestore
+from datetime import datetime, timedelta, timezone
 import tzlocal  # For local timezone conversion
+from firebaseConfig import get_db
+from utils import repository
+from utils.concurrency import fetch_concurrently
+from utils.quiz_db import to_utc_datetime
+from utils.user_db import student_snapshot
+
+# Expired quizzes stay listed (and clearable) for this long after their end_time
+EXPIRED_QUIZ_GRACE = timedelta(minutes=int(os.getenv("QUIZ_EXPIRED_GRACE_MINUTES", "1440")))
 
 def get_firestore_client():
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("serviceAccountKey.json")  # adjust path as needed
-        firebase_admin.initialize_app(cred)
-    return firestore.client()
+    return get_db()
 
 def show_student_dashboard(db=None):
     if db is None:
@@ -19,49 +23,47 @@ def show_student_dashboard(db=None):
 
     st.header("🎓 Student Dashboard")
 
-    # Fetch current student data
-    student_doc = db.collection("users").document(st.session_state.uid).get()
-    student_data = student_doc.to_dict()
-
     # Get current UTC time and local timezone
     now_utc = datetime.now(timezone.utc)
     local_tz = tzlocal.get_localzone()
     now_local = now_utc.astimezone(local_tz)
 
-    # Fetch quizzes of the assigned teacher
-    quizzes = db.collection("quizzes").where("teacher_id", "==", student_data.get("teacher_id")).stream()
-
-    # Fetch quizzes already submitted by this student
-    submitted_quiz_ids = {
-        res.to_dict().get("quiz_id")
-        for res in db.collection("student_results")
-                     .where("student_id", "==", st.session_state.uid)
-                     .stream()
-    }
+    uid = st.session_state.uid
+
+    def load_student_and_quizzes():
+        # Quizzes depend on the student's teacher, so these two reads are chained
+        student = repository.get_user(db, uid) or {}
+        # Only quizzes that have not been over for longer than the grace window
+        quizzes = repository.list_open_quizzes_for_teacher(
+            db, student.get("teacher_id"), now_utc - EXPIRED_QUIZ_GRACE
+        )
+        return student, quizzes
+
+    # ✅ Issue all independent reads at once and wait for the slowest
+    loaded = fetch_concurrently({
+        "student_and_quizzes": load_student_and_quizzes,
+        "results": lambda: repository.list_results_for_student(db, uid),
+        "teachers": lambda: repository.list_teachers(db),
+        "pending": lambda: repository.list_pending_requests_for_student(db, uid),
+    })
+    student_data, quizzes = loaded["student_and_quizzes"]
+
+    # This student's results are fetched once; both the submitted set and the history use them
+    results = loaded["results"]
+    submitted_quiz_ids = {res.get("quiz_id") for _, res in results}
 
     quiz_available = False
     expired_quiz_ids = []
 
-    for quiz in quizzes:
-        if quiz.id in submitted_quiz_ids:
+    for quiz_id, data in quizzes:
+        if quiz_id in submitted_quiz_ids:
             continue  # Skip quizzes already submitted
 
-        data = quiz.to_dict()
         quiz_title = data.get("title", "Untitled Quiz")
 
         try:
-            start_val = data["start_time"]
-            end_val = data["end_time"]
-
-            if isinstance(start_val, datetime):
-                start_utc = start_val.astimezone(timezone.utc)
-            else:
-                start_utc = datetime.fromisoformat(start_val).replace(tzinfo=timezone.utc)
-
-            if isinstance(end_val, datetime):
-                end_utc = end_val.astimezone(timezone.utc)
-            else:
-                end_utc = datetime.fromisoformat(end_val).replace(tzinfo=timezone.utc)
+            start_utc = to_utc_datetime(data["start_time"])
+            end_utc = to_utc_datetime(data["end_time"])
         except Exception:
             st.warning(f"Invalid start or end time for quiz '{quiz_title}'. Skipping.")
             continue
@@ -76,38 +78,41 @@ def show_student_dashboard(db=None):
             st.subheader(f"Quiz: {quiz_title}")
             st.write(f"Available until: {end_local.strftime('%Y-%m-%d %H:%M %Z')}")
 
-            if st.session_state.get("active_quiz_id") == quiz.id:
-                with st.form(f"quiz_form_{quiz.id}"):
+            if st.session_state.get("active_quiz_id") == quiz_id:
+                # Questions are only fetched for the quiz being attempted
+                questions = repository.get_quiz_questions(db, quiz_id)
+                with st.form(f"quiz_form_{quiz_id}"):
                     answers = {}
-                    for i, q in enumerate(data["questions"], 1):
+                    for i, q in enumerate(questions, 1):
                         st.write(f"**Q{i}: {q['question']}**")
                         answers[q["question"]] = st.radio(
-                            label="Choose:", options=q["options"], key=f"{quiz.id}_{i}"
+                            label="Choose:", options=q["options"], key=f"{quiz_id}_{i}"
                         )
                     if st.form_submit_button("Submit"):
                         correct = sum(
-                            1 for q in data["questions"] if answers[q["question"]] == q["answer"]
+                            1 for q in questions if answers[q["question"]] == q["answer"]
                         )
-                        total = len(data["questions"])
-                        db.collection("student_results").add({
+                        total = len(questions)
+                        repository.add_result(db, {
                             "student_id": st.session_state.uid,
-                            "quiz_id": quiz.id,
+                            "quiz_id": quiz_id,
                             "quiz_title": quiz_title,
                             "score": correct,  # Store score as integer
                             "total": total,
-                            "submitted_at": datetime.now(timezone.utc).isoformat()
+                            "submitted_at": datetime.now(timezone.utc).isoformat(),
+                            **student_snapshot(student_data),
                         })
                         st.success("✅ Quiz submitted successfully!")
                         st.session_state.active_quiz_id = None
                         st.rerun()
             else:
-                if st.button(f"📝 Attempt Quiz: {quiz_title}", key=f"btn_{quiz.id}"):
-                    st.session_state.active_quiz_id = quiz.id
+                if st.button(f"📝 Attempt Quiz: {quiz_title}", key=f"btn_{quiz_id}"):
+                    st.session_state.active_quiz_id = quiz_id
                     st.rerun()
         else:
             st.warning(f"⏰ Quiz '{quiz_title}' has expired.")
-            expired_quiz_ids.append(quiz.id)
-            if st.session_state.get("active_quiz_id") == quiz.id:
+            expired_quiz_ids.append(quiz_id)
+            if st.session_state.get("active_quiz_id") == quiz_id:
                 st.session_state.active_quiz_id = None
                 st.rerun()
 
@@ -116,15 +121,15 @@ def show_student_dashboard(db=None):
 
     if expired_quiz_ids:
         if st.button("🗑️ Clear Expired Quizzes"):
-            for qid in expired_quiz_ids:
-                db.collection("quizzes").document(qid).delete()
+            progress_bar = st.progress(0.0, text="Deleting expired quizzes...")
+            repository.delete_quizzes(
+                db, student_data.get("teacher_id"), expired_quiz_ids,
+                progress=lambda done, total: progress_bar.progress(done / total),
+            )
             st.success("✅ Expired quizzes deleted.")
             st.rerun()
 
     with st.expander("📊 Your Past Quiz Scores"):
-        results_query = db.collection("student_results").where("student_id", "==", st.session_state.uid).stream()
-        results = [(res.id, res.to_dict()) for res in results_query]
-
         if results:
             for doc_id, r in results:
                 quiz_title = r.get("quiz_title", "Untitled Quiz")
@@ -134,8 +139,10 @@ def show_student_dashboard(db=None):
                 st.write(f"**{quiz_title}** — Score: {score}/{total} — Submitted: {submitted_at}")
 
             if st.button("🗑️ Delete All Records"):
-                for doc_id, _ in results:
-                    db.collection("student_results").document(doc_id).delete()
+                progress_bar = st.progress(0.0, text="Deleting past quiz records...")
+                repository.delete_results(
+                    db, results, progress=lambda done, total: progress_bar.progress(done / total)
+                )
                 st.success("✅ All past quiz records deleted.")
                 st.rerun()
         else:
@@ -145,17 +152,10 @@ def show_student_dashboard(db=None):
     st.subheader("📚 Register Under a Teacher")
 
     # Fetch all teachers
-    teachers_query = db.collection("users").where("role", "==", "Teacher").stream()
-    teacher_list = [(t.id, t.to_dict().get("name", "Unnamed")) for t in teachers_query]
+    teacher_list = [(tid, t.get("name", "Unnamed")) for tid, t in loaded["teachers"]]
 
     # Fetch pending requests
-    pending_requests = {
-        req.to_dict()["teacher_id"]
-        for req in db.collection("teacher_requests")
-                     .where("student_id", "==", st.session_state.uid)
-                     .where("status", "==", "pending")
-                     .stream()
-    }
+    pending_requests = {req["teacher_id"] for _, req in loaded["pending"]}
 
     # Label each teacher appropriately
     teacher_display_list = []
@@ -175,11 +175,12 @@ def show_student_dashboard(db=None):
 
     if selected_tid != student_data.get("teacher_id") and selected_tid not in pending_requests:
         if st.button("Send Registration Request"):
-            db.collection("teacher_requests").add({
+            repository.add_teacher_request(db, {
                 "student_id": st.session_state.uid,
                 "teacher_id": selected_tid,
                 "status": "pending",
-                "timestamp": datetime.now(timezone.utc)
+                "timestamp": datetime.now(timezone.utc),
+                **student_snapshot(student_data),
             })
             st.success("✅ Registration request sent.")
             st.rerun()
@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta, timezone
 import streamlit as st
-from utils.mcqs_generator import generate_mcqs
-from utils.pdf_utils import extract_text_from_pdf
+from utils.cloze_generator import generate_cloze_mcqs
+from utils.dedup import bank_index
+from utils.mcqs_generator import in_document_order, iter_mcqs
+from utils.pdf_utils import extract_text_with_report, read_outline
 from utils.quiz_db import create_quiz
+from utils import repository
+from utils.concurrency import fetch_concurrently
 
 # Compatibility helper for rerun (handles older versions of Streamlit)
 def rerun():
@@ -11,6 +15,36 @@ def rerun():
     except AttributeError:
         st.experimental_rerun()
 
+# PDFs longer than this get a page/chapter picker before any text is extracted
+PAGE_PICKER_MIN_PAGES = 10
+
+
+def choose_page_range(outline):
+    # Pages to extract as 0-based (start, stop), or None until the teacher confirms
+    page_count = outline["page_count"]
+    if page_count <= PAGE_PICKER_MIN_PAGES:
+        return 0, page_count
+
+    chapters = outline["chapters"]
+    whole, custom = "Whole document", "Custom page range"
+    choices = [whole] + [f"{title} (pages {start + 1}–{stop})" for title, start, stop in chapters] + [custom]
+    choice = st.selectbox(f"📑 Pages to use ({page_count} pages in this PDF)", choices, key="teacher_page_choice")
+    if choice == whole:
+        page_range = (0, page_count)
+    elif choice == custom:
+        col1, col2 = st.columns(2)
+        first = col1.number_input("From page", min_value=1, max_value=page_count, value=1, key="teacher_first_page")
+        last = col2.number_input("To page", min_value=1, max_value=page_count, value=page_count, key="teacher_last_page")
+        page_range = (int(first) - 1, int(max(first, last)))
+    else:
+        _, start, stop = chapters[choices.index(choice) - 1]
+        page_range = (start, stop)
+
+    if st.button("📖 Extract selected pages"):
+        return page_range
+    return None
+
+
 def show_teacher_dashboard(db):
     if not st.session_state.get("logged_in") or st.session_state.get("role") != "Teacher":
         st.error("Access denied. Please log in as a Teacher.")
@@ -40,16 +74,64 @@ def show_teacher_dashboard(db):
             if not quiz_state["uploaded"]:
                 uploaded_file = st.file_uploader("📄 Upload PDF", type="pdf", key="teacher_pdf_uploader")
                 if uploaded_file:
-                    quiz_state["pdf_text"] = extract_text_from_pdf(uploaded_file)
-                    quiz_state["uploaded"] = True
-                    st.success("✅ PDF uploaded and text extracted.")
+                    # Only the outline and page count are read until the teacher picks pages
+                    upload_id = (uploaded_file.name, uploaded_file.size)
+                    if quiz_state.get("outline_for") != upload_id:
+                        quiz_state["outline"] = read_outline(uploaded_file)
+                        quiz_state["outline_for"] = upload_id
+                    page_range = choose_page_range(quiz_state["outline"])
+                    if page_range is not None:
+                        with st.spinner("Extracting text..."):
+                            quiz_state["pdf_text"], report = extract_text_with_report(uploaded_file, page_range)
+                        quiz_state["uploaded"] = True
+                        st.success(f"✅ PDF uploaded and text extracted from pages {page_range[0] + 1}–{page_range[1]}.")
+                        if report["lines_removed"]:
+                            st.caption(
+                                f"🧹 Removed {report['lines_removed']} header, footer and contents lines "
+                                f"({report['chars_removed']:,} characters, ~{report['tokens_saved']:,} tokens)."
+                            )
 
             if quiz_state["uploaded"] and quiz_state["pdf_text"]:
                 num_questions = st.slider("🧮 Number of questions", 1, 10, 5, key="teacher_num_questions")
+                fast_mode = st.checkbox(
+                    "⚡ Fast mode (fill-in-the-blank questions without AI)", key="teacher_fast_mode"
+                )
                 if st.button("🧠 Generate Questions"):
-                    with st.spinner("Generating MCQs..."):
-                        quiz_state["questions"] = generate_mcqs(quiz_state["pdf_text"], num_questions)
-                    st.success("✅ MCQs generated!")
+                    try:
+                        # Questions close to ones in earlier quizzes are skipped or regenerated;
+                        # only quizzes created since the last generation are read
+                        quiz_ids = [qid for qid, _ in repository.list_quizzes_for_teacher(db, st.session_state.uid)]
+                        existing = bank_index(
+                            st.session_state.uid,
+                            quiz_ids,
+                            lambda ids: repository.get_questions_for_quizzes(db, ids),
+                        )
+                    except Exception as e:
+                        st.warning(f"⚠️ Couldn't load your earlier questions to avoid repeats: {e}")
+                        existing = None
+                    if fast_mode:
+                        quiz_state["questions"] = generate_cloze_mcqs(
+                            quiz_state["pdf_text"], num_questions, existing=existing
+                        )
+                        if quiz_state["questions"]:
+                            st.success("✅ MCQs generated!")
+                        else:
+                            st.error("❌ Not enough text in this PDF to build fill-in-the-blank questions.")
+                    else:
+                        quiz_state["questions"] = []
+                        live_preview = st.empty()
+                        with st.spinner("Generating MCQs..."):
+                            # Show each question as soon as it arrives
+                            for q in iter_mcqs(quiz_state["pdf_text"], num_questions, existing=existing):
+                                quiz_state["questions"].append(q)
+                                with live_preview.container():
+                                    st.caption(f"Generated {len(quiz_state['questions'])} of {num_questions}")
+                                    for i, done in enumerate(quiz_state["questions"], 1):
+                                        st.markdown(f"**Q{i}:** {done['question']}")
+                        live_preview.empty()
+                        # Saved in the order the chunks appear in the PDF, not completion order
+                        quiz_state["questions"] = in_document_order(quiz_state["questions"])
+                        st.success("✅ MCQs generated!")
 
             if quiz_state.get("questions"):
                 st.subheader("📋 Generated MCQs")
@@ -86,12 +168,18 @@ def show_teacher_dashboard(db):
     with tabs[1]:
         if st.session_state.active_tab == tab_labels[1]:
             st.subheader("📚 Registered Students")
-            try:
-                students_query = db.collection("users").where("teacher_id", "==", st.session_state.uid).stream()
-                students = [s.to_dict() for s in students_query]
-            except Exception as e:
-                st.error(f"Error fetching registered students: {e}")
+            # session_state is not available on worker threads, so read the uid here
+            teacher_id = st.session_state.uid
+            loaded = fetch_concurrently({
+                "students": lambda: repository.list_students_for_teacher(db, teacher_id),
+                "pending": lambda: repository.list_pending_requests_for_teacher(db, teacher_id),
+            }, return_exceptions=True)
+
+            if isinstance(loaded["students"], Exception):
+                st.error(f"Error fetching registered students: {loaded['students']}")
                 students = []
+            else:
+                students = [s for _, s in loaded["students"]]
 
             if students:
                 for student in students:
@@ -103,43 +191,40 @@ def show_teacher_dashboard(db):
                 st.info("No students have registered under you yet.")
 
             st.subheader("📥 Pending Student Requests")
-            try:
-                requests = db.collection("teacher_requests")\
-                    .where("teacher_id", "==", st.session_state.uid)\
-                    .where("status", "==", "pending").stream()
-                pending_requests = list(requests)
-            except Exception as e:
-                st.error(f"Error fetching requests: {e}")
+            if isinstance(loaded["pending"], Exception):
+                st.error(f"Error fetching requests: {loaded['pending']}")
                 pending_requests = []
+            else:
+                pending_requests = loaded["pending"]
 
             if pending_requests:
-                for req in pending_requests:
-                    req_data = req.to_dict()
+                try:
+                    # Older requests predate the name/email snapshot; only those need a lookup
+                    request_students = repository.get_users(
+                        db, [data["student_id"] for _, data in pending_requests if not data.get("student_name")]
+                    )
+                except Exception as e:
+                    st.error(f"Error fetching student profiles: {e}")
+                    request_students = {}
+
+                for req_id, req_data in pending_requests:
                     student_id = req_data["student_id"]
-                    student_doc = db.collection("users").document(student_id).get()
-                    student_info = student_doc.to_dict() if student_doc.exists else {}
-                    student_name = student_info.get("name", "Unknown")
-                    student_email = student_info.get("email", "Unknown")
+                    student_info = request_students.get(student_id, {})
+                    student_name = req_data.get("student_name") or student_info.get("name", "Unknown")
+                    student_email = req_data.get("student_email") or student_info.get("email", "Unknown")
 
                     st.write(f"👤 {student_name} ({student_email})")
 
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button("✅ Accept", key=f"accept_{student_id}"):
-                            db.collection("users").document(student_id).update({
-                                "teacher_id": st.session_state.uid
-                            })
-                            db.collection("teacher_requests").document(req.id).update({
-                                "status": "accepted"
-                            })
+                            repository.accept_teacher_request(db, req_id, req_data)
                             st.success(f"Accepted {student_name}")
                             rerun()
 
                     with col2:
                         if st.button("❌ Reject", key=f"reject_{student_id}"):
-                            db.collection("teacher_requests").document(req.id).update({
-                                "status": "rejected"
-                            })
+                            repository.set_request_status(db, req_id, req_data, "rejected")
                             st.info(f"Rejected {student_name}")
                             rerun()
             else:
@@ -150,27 +235,43 @@ def show_teacher_dashboard(db):
         if st.session_state.active_tab == tab_labels[2]:
             st.header("📋 View Student Scores")
             try:
-                quizzes = list(db.collection("quizzes").where("teacher_id", "==", st.session_state.uid).stream())
+                quizzes = repository.list_quizzes_for_teacher(db, st.session_state.uid)
             except Exception as e:
                 st.error(f"Error fetching quizzes: {e}")
                 quizzes = []
 
             if quizzes:
-                quiz_list = [(quiz.id, quiz.to_dict().get("title", "Untitled")) for quiz in quizzes]
+                quiz_list = [(quiz_id, quiz.get("title", "Untitled")) for quiz_id, quiz in quizzes]
                 quiz_ids, quiz_titles = zip(*quiz_list)
                 selected_quiz_title = st.selectbox("Select a quiz to view student scores", quiz_titles)
                 selected_quiz_id = quiz_ids[quiz_titles.index(selected_quiz_title)]
 
+                # Questions are loaded only when the teacher opens them
+                if st.checkbox("🔍 Show questions", key=f"show_questions_{selected_quiz_id}"):
+                    try:
+                        for i, q in enumerate(repository.get_quiz_questions(db, selected_quiz_id), 1):
+                            st.markdown(f"**Q{i}:** {q['question']}")
+                            st.markdown(f"✅ **Answer:** {q['answer']}")
+                    except Exception as e:
+                        st.error(f"Error fetching questions: {e}")
+
                 try:
-                    submissions = list(db.collection("student_results").where("quiz_id", "==", selected_quiz_id).stream())
+                    submissions = repository.list_results_for_quiz(db, selected_quiz_id)
                 except Exception as e:
                     st.error(f"Error fetching student submissions: {e}")
                     submissions = []
 
                 if submissions:
                     st.subheader(f"Scores for '{selected_quiz_title}'")
-                    for res in submissions:
-                        res_dict = res.to_dict()
+                    try:
+                        submitting_students = repository.get_users(
+                            db, [r.get("student_id") for _, r in submissions if not r.get("student_name")]
+                        )
+                    except Exception as e:
+                        st.error(f"Error fetching student profiles: {e}")
+                        submitting_students = {}
+
+                    for _, res_dict in submissions:
                         student_id = res_dict.get("student_id")
                         score = res_dict.get("score")
                         submitted_at = res_dict.get("submitted_at")
@@ -179,15 +280,18 @@ def show_teacher_dashboard(db):
                         except Exception:
                             submitted_at = str(submitted_at)[:10]
 
-                        student_doc = db.collection("users").document(student_id).get()
-                        student_name = student_doc.to_dict().get("name") if student_doc.exists else student_id
+                        student_name = (
+                            res_dict.get("student_name")
+                            or submitting_students.get(student_id, {}).get("name")
+                            or student_id
+                        )
                         st.write(f"👤 **{student_name}** — Score: {int(score)} — Submitted: {submitted_at}")
 
                     st.info("You cannot delete this quiz because students have submitted it.")
                 else:
                     if st.button(f"❌ Delete Quiz: {selected_quiz_title}", key=f"del_{selected_quiz_id}"):
                         try:
-                            db.collection("quizzes").document(selected_quiz_id).delete()
+                            repository.delete_quizzes(db, st.session_state.uid, [selected_quiz_id])
                             st.success(f"Quiz '{selected_quiz_title}' deleted.")
                             rerun()
                         except Exception as e:
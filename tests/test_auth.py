@@ -1,9 +1,12 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from utils import auth
+from utils import auth, repository
 
 class TestAuthFunctions(unittest.TestCase):
 
+    def setUp(self):
+        repository.clear_cache()
+
     @patch('utils.auth.requests.post')
     @patch('utils.auth.db')
     def test_signup_user_success(self, mock_db, mock_post):
@@ -0,0 +1,52 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from utils import backfill
+
+
+def _doc(data):
+    doc = MagicMock()
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestBackfill(unittest.TestCase):
+    @patch("utils.backfill.get_users_by_ids")
+    def test_backfill_student_snapshots_updates_missing_only(self, mock_get_users):
+        mock_db = MagicMock()
+        done = _doc({"student_id": "s1", "student_name": "Ann"})
+        todo = [_doc({"student_id": "s2"}), _doc({"student_id": "s3"}), _doc({"student_id": "gone"})]
+        mock_db.collection.return_value.stream.return_value = [done] + todo
+        mock_get_users.return_value = {
+            "s2": {"name": "Bob", "email": "bob@example.com"},
+            "s3": {"name": "Cy", "email": "cy@example.com"},
+        }
+        batch = mock_db.batch.return_value
+
+        result = backfill.backfill_student_snapshots(mock_db, batch_size=1, collections=("student_results",))
+
+        self.assertEqual(result, {"student_results": 2})
+        mock_get_users.assert_called_once_with(mock_db, ["s2", "s3", "gone"])
+        batch.update.assert_any_call(
+            todo[0].reference, {"student_name": "Bob", "student_email": "bob@example.com"}
+        )
+        self.assertEqual(batch.commit.call_count, 2)
+
+    def test_normalize_quiz_times(self):
+        mock_db = MagicMock()
+        legacy = _doc({"start_time": "2025-05-25T10:00:00", "end_time": "2025-05-25T10:30:00"})
+        current = _doc({"start_time": datetime(2025, 5, 25, tzinfo=timezone.utc)})
+        mock_db.collection.return_value.stream.return_value = [legacy, current]
+        batch = mock_db.batch.return_value
+
+        self.assertEqual(backfill.normalize_quiz_times(mock_db), 1)
+        batch.update.assert_called_once_with(legacy.reference, {
+            "start_time": datetime(2025, 5, 25, 10, 0, tzinfo=timezone.utc),
+            "end_time": datetime(2025, 5, 25, 10, 30, tzinfo=timezone.utc),
+        })
+        batch.commit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
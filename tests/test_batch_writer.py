@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import MagicMock
+
+from utils import batch_writer
+from utils.batch_writer import delete_op, set_op, update_op
+
+
+class TestBatchWriter(unittest.TestCase):
+    def test_bulk_write_splits_into_batches_and_reports_progress(self):
+        mock_db = MagicMock()
+        batches = []
+
+        def new_batch():
+            batch = MagicMock()
+            batches.append(batch)
+            return batch
+
+        mock_db.batch.side_effect = new_batch
+        progress = []
+        ops = [delete_op(f"ref{i}") for i in range(5)]
+
+        written = batch_writer.bulk_write(mock_db, ops, batch_size=2, progress=lambda d, t: progress.append((d, t)))
+
+        self.assertEqual(written, 5)
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(sum(b.delete.call_count for b in batches), 5)
+        for batch in batches:
+            batch.commit.assert_called_once()
+        self.assertEqual(progress[-1], (5, 5))
+
+    def test_bulk_write_mixed_operations_single_batch(self):
+        mock_db = MagicMock()
+        batch = mock_db.batch.return_value
+
+        batch_writer.bulk_write(mock_db, [update_op("a", {"x": 1}), set_op("b", {"y": 2}), delete_op("c")])
+
+        batch.update.assert_called_once_with("a", {"x": 1})
+        batch.set.assert_called_once_with("b", {"y": 2})
+        batch.delete.assert_called_once_with("c")
+        batch.commit.assert_called_once()
+
+    def test_bulk_write_caps_batch_size(self):
+        mock_db = MagicMock()
+        batch_writer.bulk_write(mock_db, [delete_op(i) for i in range(501)], batch_size=1000)
+        self.assertEqual(mock_db.batch.return_value.commit.call_count, 2)
+
+    def test_bulk_write_nothing_to_do(self):
+        mock_db = MagicMock()
+        self.assertEqual(batch_writer.bulk_write(mock_db, []), 0)
+        mock_db.batch.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from utils.boilerplate import strip_boilerplate
+
+
+def _page(number, body):
+    return [
+        ("top", f"Biology Basics — Chapter 2 | {number}"),
+        ("body", body),
+        ("body", "Key terms"),
+        ("bottom", str(number)),
+    ]
+
+
+class TestStripBoilerplate(unittest.TestCase):
+    def test_drops_running_headers_footers_and_page_numbers(self):
+        pages = [_page(n, f"Body text about topic {n} that should stay.") for n in range(1, 7)]
+
+        texts, report = strip_boilerplate(pages)
+
+        self.assertEqual(texts[0], "Body text about topic 1 that should stay.\n")
+        self.assertEqual(texts[5], "Body text about topic 6 that should stay.\n")
+        # Header, repeated body line and page number on each of the 6 pages
+        self.assertEqual(report["lines_removed"], 18)
+        self.assertEqual(report["pages"], 6)
+        self.assertEqual(report["chars_removed"], sum(
+            len(text) + 1 for page in pages for _, text in page if "Body text" not in text
+        ))
+        self.assertGreater(report["tokens_saved"], 0)
+
+    def test_keeps_body_lines_that_only_differ_in_numbers(self):
+        pages = [[("body", f"Table row {n}: value {n * 3}")] for n in range(6)]
+
+        texts, report = strip_boilerplate(pages)
+
+        self.assertEqual(texts[2], "Table row 2: value 6\n")
+        self.assertEqual(report["lines_removed"], 0)
+        self.assertEqual(report["tokens_saved"], 0)
+
+    def test_short_documents_keep_one_off_margin_lines(self):
+        pages = [[("top", "A heading that appears once"), ("body", "Text")], [("body", "More text")]]
+        texts, _ = strip_boilerplate(pages)
+        self.assertEqual(texts, ["A heading that appears once\nText\n", "More text\n"])
+
+    def test_margin_words_made_of_roman_letters_are_kept(self):
+        words = ("mild", "civil", "dim", "xiv", "MMXX")
+        pages = [[("body", f"Text {n}"), ("bottom", word)] for n, word in enumerate(words)]
+
+        texts, report = strip_boilerplate(pages)
+
+        self.assertEqual(texts[:3], ["Text 0\nmild\n", "Text 1\ncivil\n", "Text 2\ndim\n"])
+        self.assertEqual(texts[3:], ["Text 3\n", "Text 4\n"])
+        self.assertEqual(report["lines_removed"], 2)
+
+    def test_drops_table_of_contents_pages(self):
+        toc = [("body", "Contents")] + [("body", f"Chapter {n} .......... {n * 10}") for n in range(1, 7)]
+        body = [("body", "Photosynthesis turns light into chemical energy.")]
+        leader_line = [("body", "Appendix A . . . . . . 300"), ("body", "Real sentence.")]
+
+        texts, report = strip_boilerplate([toc, body, leader_line])
+
+        self.assertEqual(texts, ["", "Photosynthesis turns light into chemical energy.\n", "Real sentence.\n"])
+        self.assertEqual(report["lines_removed"], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from utils import chunker
+
+
+class TestChunker(unittest.TestCase):
+    def test_iter_sentences_handles_abbreviations_and_initials(self):
+        text = "Dr. Smith met J. Watson at 3.14 p.m. today. It rained!\nWas it?  \"Yes,\" he said. No period at the end"
+        self.assertEqual(list(chunker.iter_sentences(text)), [
+            "Dr. Smith met J. Watson at 3.14 p.m. today.",
+            "It rained!",
+            "Was it?",
+            "\"Yes,\" he said.",
+            "No period at the end",
+        ])
+
+    def test_chunk_text_respects_token_budget_and_keeps_sentences_whole(self):
+        sentence = "Chlorophyll absorbs mostly blue and red light in the leaf. "
+        text = sentence * 40
+        budget = chunker.count_tokens(sentence.strip()) * 3
+
+        chunks = chunker.chunk_text(text, max_tokens=budget)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(chunker.count_tokens(chunk), budget + 3)
+            self.assertTrue(chunk.endswith("."))
+        self.assertEqual(sum(c.count("Chlorophyll") for c in chunks), 40)
+
+    def test_iter_sentences_breaks_on_newline_led_lowercase_and_bullets(self):
+        text = "First line ends here.\nthen a lowercase line.\n• a bullet without a stop\n• another bullet"
+        self.assertEqual(list(chunker.iter_sentences(text)), [
+            "First line ends here.",
+            "then a lowercase line.",
+            "• a bullet without a stop",
+            "• another bullet",
+        ])
+
+    def test_chunk_text_splits_sentences_over_budget(self):
+        budget = 50
+        lowercase = "the cell membrane controls what enters and leaves the cell and " * 300
+        bullets = "\n".join(f"• item {i} of the list of organelles in the cell" for i in range(200))
+
+        for text in (lowercase, bullets, "x" * 1000 + " tail words here"):
+            chunks = chunker.chunk_text(text, max_tokens=budget)
+            self.assertGreater(len(chunks), 1)
+            for chunk in chunks:
+                self.assertLessEqual(chunker.count_tokens(chunk), budget)
+        self.assertEqual(
+            sum(c.count("membrane") for c in chunker.chunk_text(lowercase, max_tokens=budget)), 300
+        )
+
+    def test_chunk_text_drops_short_fragments(self):
+        self.assertEqual(chunker.chunk_text("Page 4. Chapter 2. Short."), [])
+
+    def test_select_chunks_spreads_across_document(self):
+        chunks = [f"chunk {i}" for i in range(100)]
+        selected = chunker.select_chunks(chunks, 4)
+        indices = [chunks.index(c) for c in selected]
+
+        self.assertEqual(len(selected), 4)
+        self.assertEqual(indices, sorted(indices))
+        for i, index in enumerate(indices):
+            self.assertTrue(i * 25 <= index < (i + 1) * 25)
+
+    def test_select_chunks_prefers_dense_chunks_within_a_span(self):
+        filler = "it is what it is and it was what it was " * 3
+        dense = "Mitochondria produce adenosine triphosphate through oxidative phosphorylation"
+        self.assertEqual(chunker.select_chunks([filler, dense, filler], 1), [dense])
+
+    def test_select_chunks_returns_everything_when_short(self):
+        self.assertEqual(chunker.select_chunks(["a", "b"], 5), ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from unittest.mock import patch
+
+from utils import cloze_generator
+from utils.dedup import NearDuplicateIndex
+from utils.cloze_generator import TermModel, document_model, generate_cloze_mcqs, term_type
+
+SAMPLE = (
+    "Photosynthesis is the process used by plants to convert sunlight into chemical energy. "
+    "This process primarily occurs in the chloroplasts of plant cells using chlorophyll. "
+    "Carbon dioxide and water are converted into glucose and oxygen during the Calvin cycle. "
+    "Mitochondria perform cellular respiration, releasing energy stored in glucose molecules. "
+    "The Krebs cycle takes place in the mitochondrial matrix of eukaryotic cells. "
+    "In 1771 Joseph Priestley discovered that green plants restore the quality of air. "
+    "Jan Ingenhousz showed in 1779 that light is essential for plants to restore air. "
+    "Melvin Calvin mapped the carbon fixation pathway in 1950 at the University of California. "
+)
+
+
+class TestClozeGenerator(unittest.TestCase):
+    def setUp(self):
+        cloze_generator.clear_models()
+
+    def test_term_type(self):
+        self.assertEqual(term_type("1779"), "number")
+        self.assertEqual(term_type("Calvin"), "proper")
+        self.assertEqual(term_type("respiration"), "noun")
+        self.assertEqual(term_type("glucose"), "word")
+        self.assertEqual(term_type("carbon dioxide"), "phrase")
+
+    def test_generate_cloze_mcqs_shape(self):
+        mcqs = generate_cloze_mcqs(SAMPLE * 2, num_questions=4)
+
+        self.assertGreater(len(mcqs), 0)
+        for mcq in mcqs:
+            self.assertIn(cloze_generator.BLANK, mcq["question"])
+            self.assertEqual(len(mcq["options"]), 4)
+            self.assertEqual(len(set(o.lower() for o in mcq["options"])), 4)
+            self.assertIn(mcq["answer"], mcq["options"])
+            # The blanked sentence doesn't give the answer away
+            self.assertNotIn(mcq["answer"].lower(), mcq["question"].lower().split())
+
+    def test_generation_is_deterministic(self):
+        self.assertEqual(generate_cloze_mcqs(SAMPLE, 3), generate_cloze_mcqs(SAMPLE, 3))
+
+    def test_distractors_prefer_same_type(self):
+        model = TermModel([SAMPLE])
+        distractors = model.distractors("1771")
+        self.assertEqual(distractors[:2], ["1779", "1950"])
+        self.assertEqual(len(distractors), 3)
+        self.assertTrue(all(d.isdigit() for d in distractors))
+
+    def test_distractors_are_not_part_of_the_answer(self):
+        model = TermModel([SAMPLE, SAMPLE])
+        self.assertIn("Carbon dioxide", model.phrases)
+        distractors = model.distractors("carbon")
+        self.assertEqual(len(distractors), 3)
+        self.assertFalse(any("carbon" in d.lower().split() for d in distractors))
+
+    def test_options_for_tops_up_weak_options(self):
+        model = TermModel([SAMPLE])
+        options = model.options_for("glucose", keep=["oxygen", "Oxygen", "glucose"])
+        self.assertEqual(len(options), 4)
+        self.assertEqual(len({o.lower() for o in options}), 4)
+        self.assertIn("glucose", options)
+        self.assertIn("oxygen", options)
+
+    def test_document_model_is_cached_by_content(self):
+        model = document_model([SAMPLE])
+        self.assertIs(document_model([SAMPLE]), model)
+        self.assertIsNot(document_model([SAMPLE + " More."]), model)
+        self.assertIs(model.embeddings, model.embeddings)
+
+    def test_cloze_blanks_every_occurrence_of_the_answer(self):
+        model = TermModel([
+            "Osmosis moves water across a membrane, and osmosis needs no energy from the cell. "
+            "Diffusion spreads glucose molecules evenly through the cytoplasm of every living cell.",
+            "Active transport pumps sodium ions against their gradient using energy from ATP molecules.",
+        ])
+        mcq = model.cloze_question(0)
+        self.assertEqual(mcq["answer"], "Osmosis")
+        self.assertEqual(mcq["question"].count(cloze_generator.BLANK), 2)
+        self.assertNotIn("osmosis", mcq["question"].lower())
+
+    def test_term_without_enough_distractors_moves_on_to_the_next_term(self):
+        model = TermModel([
+            "Osmosis moves water across a membrane, and osmosis needs no energy from the cell. "
+            "Diffusion spreads glucose molecules evenly through the cytoplasm of every living cell.",
+            "Active transport pumps sodium ions against their gradient using energy from ATP molecules.",
+        ])
+        distractors = model.distractors
+        with patch.object(model, "distractors", side_effect=lambda answer, **kwargs: (
+            [] if answer == "Osmosis" else distractors(answer, **kwargs)
+        )):
+            mcq = model.cloze_question(0)
+        self.assertIsNotNone(mcq)
+        self.assertNotEqual(mcq["answer"], "Osmosis")
+        self.assertIn(mcq["answer"], mcq["options"])
+
+    def test_hundreds_of_questions_share_one_term_model(self):
+        enzymes = ["amylase", "lipase", "pepsin", "trypsin", "lactase", "maltase", "sucrase", "catalase"]
+        substrates = ["starch", "fats", "proteins", "peptides", "lactose", "maltose", "sucrose", "peroxide"]
+        places = ["mouth", "stomach", "intestine", "pancreas", "liver", "colon", "kidney", "blood"]
+        text = " ".join(
+            f"Enzyme sample {i} of {enzymes[i % 8]} breaks {substrates[i // 8 % 8]} quickly "
+            f"inside the {places[i // 64 % 8]} at {30 + i % 13} degrees."
+            for i in range(1200)
+        )
+        with patch("utils.cloze_generator.TermModel", wraps=TermModel) as model_class:
+            mcqs = generate_cloze_mcqs(text, num_questions=200)
+            generate_cloze_mcqs(text, num_questions=200)
+        self.assertGreaterEqual(len(mcqs), 100)
+        # The TF-IDF model is built once per document, not once per question
+        model_class.assert_called_once()
+
+    def test_repeated_sentences_give_no_duplicate_questions(self):
+        passage = (
+            "Photosynthesis is the process used by plants to convert sunlight into chemical energy. "
+            "This process primarily occurs in the chloroplasts of plant cells using chlorophyll. "
+            "Carbon dioxide and water are converted into glucose and oxygen during the Calvin cycle. "
+        )
+        mcqs = generate_cloze_mcqs(passage * 3, num_questions=4)
+
+        self.assertGreater(len(mcqs), 1)
+        questions = [mcq["question"] for mcq in mcqs]
+        index = NearDuplicateIndex()
+        for i, question in enumerate(questions):
+            self.assertEqual(index.query(question), [])
+            index.add(i, question)
+
+        # Questions already in the teacher's bank are skipped too
+        self.assertNotIn(questions[0], [m["question"] for m in generate_cloze_mcqs(passage * 3, 4, existing=index)])
+
+    def test_no_text(self):
+        self.assertEqual(generate_cloze_mcqs("", 3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import threading
+import time
+import unittest
+
+from utils.concurrency import fetch_concurrently
+
+
+class TestConcurrency(unittest.TestCase):
+    def test_fetch_concurrently_runs_tasks_in_parallel(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def task(value):
+            def run():
+                barrier.wait()  # only passes if all three run at once
+                return value
+            return run
+
+        start = time.perf_counter()
+        results = fetch_concurrently({"a": task(1), "b": task(2), "c": task(3)})
+
+        self.assertEqual(results, {"a": 1, "b": 2, "c": 3})
+        self.assertLess(time.perf_counter() - start, 2)
+
+    def test_fetch_concurrently_exceptions(self):
+        def boom():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            fetch_concurrently({"ok": lambda: 1, "bad": boom})
+
+        results = fetch_concurrently({"ok": lambda: 1, "bad": boom}, return_exceptions=True)
+        self.assertEqual(results["ok"], 1)
+        self.assertIsInstance(results["bad"], ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
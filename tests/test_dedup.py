@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import patch
+
+from utils import dedup
+from utils.dedup import NearDuplicateIndex, bank_index, shingles
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        dedup.clear_banks()
+
+    def test_shingles_ignore_case_punctuation_and_cloze_prefix(self):
+        self.assertEqual(shingles("Fill in the blank: The Cell, membrane!"), {"the cell", "cell membrane"})
+        self.assertEqual(shingles("Mitochondria?"), {"mitochondria"})
+        self.assertEqual(shingles("?!"), set())
+
+    def test_finds_near_duplicates_only(self):
+        index = NearDuplicateIndex()
+        index.add("a", "What is the powerhouse of the cell?")
+        index.add("b", "Which gas do plants release during photosynthesis?")
+
+        self.assertEqual(index.query("what is the powerhouse of the cell"), ["a"])
+        self.assertEqual(index.query("Which gas do plants release during photosynthesis today?"), ["b"])
+        self.assertEqual(index.query("In which year did Priestley discover oxygen?"), [])
+        self.assertEqual(index.query(""), [])
+
+    def test_bank_index_only_loads_new_quizzes(self):
+        bank = {
+            "q1": [{"question": "What is the powerhouse of the cell?"}],
+            "q2": [{"question": "Which gas do plants release during photosynthesis?"}],
+        }
+        loaded = []
+
+        def load(quiz_ids):
+            loaded.append(list(quiz_ids))
+            return {quiz_id: bank[quiz_id] for quiz_id in quiz_ids}
+
+        first = bank_index("t1", ["q1"], load)
+        second = bank_index("t1", ["q1", "q2"], load)
+        self.assertIs(first, second)
+        self.assertEqual(len(second), 2)
+        self.assertIs(bank_index("t1", ["q1", "q2"], load), second)
+        self.assertEqual(loaded, [["q1"], ["q2"]])
+
+        # Deleting a quiz rebuilds the index without its questions
+        rebuilt = bank_index("t1", ["q2"], load)
+        self.assertIsNot(rebuilt, second)
+        self.assertEqual(loaded[-1], ["q2"])
+        self.assertEqual(rebuilt.query("What is the powerhouse of the cell?"), [])
+
+    def test_bank_indexes_are_evicted_least_recently_used_first(self):
+        load = lambda quiz_ids: {quiz_id: [{"question": f"What is {quiz_id} about?"}] for quiz_id in quiz_ids}
+        with patch("utils.dedup.MCQ_BANK_CACHE_SIZE", 2):
+            first = bank_index("t1", ["q1"], load)
+            bank_index("t2", ["q2"], load)
+            self.assertIs(bank_index("t1", ["q1"], load), first)
+            bank_index("t3", ["q3"], load)
+            self.assertEqual(list(dedup._banks), ["t1", "t3"])
+
+    def test_queries_only_compare_lsh_candidates_on_a_large_bank(self):
+        index = NearDuplicateIndex()
+        questions = [f"Question {i} asks about concept {i * 7} from chapter {i % 40} of the book" for i in range(20000)]
+        for i, question in enumerate(questions):
+            index.add(i, question)
+        compared = []
+
+        class CountingSignatures(dict):
+            def __getitem__(self, key):
+                compared.append(key)
+                return super().__getitem__(key)
+
+        index._signatures = CountingSignatures(index._signatures)
+        for i in range(200):
+            self.assertIn(i, index.query(questions[i]))
+        self.assertEqual(index.query("What is the powerhouse of the cell?"), [])
+        # A handful of bucket neighbours per query instead of the whole bank
+        self.assertLess(len(compared), 200 * len(index) // 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
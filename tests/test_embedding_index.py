@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from utils.embedding_index import EmbeddingIndex, truncated_svd
+
+
+class TestEmbeddingIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = EmbeddingIndex(
+            ["glucose", "fructose", "oxygen", "Calvin"],
+            [[1.0, 0.1, 0.0], [0.9, 0.2, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+        )
+
+    def test_vectors_are_contiguous_unit_float32(self):
+        self.assertEqual(self.index.vectors.dtype, np.float32)
+        self.assertTrue(self.index.vectors.flags["C_CONTIGUOUS"])
+        np.testing.assert_allclose(np.linalg.norm(self.index.vectors, axis=1), 1.0, rtol=1e-6)
+
+    def test_nearest_excludes_the_query(self):
+        labels = [label for label, _ in self.index.nearest("Glucose", k=2)]
+        self.assertEqual(labels, ["fructose", "oxygen"])
+        self.assertEqual(self.index.nearest("glucose", k=1, exclude=["fructose"])[0][0], "oxygen")
+
+    def test_unknown_phrases_average_their_words(self):
+        self.assertIsNone(self.index.vector("photosynthesis"))
+        vector = self.index.vector("glucose and oxygen")
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+        self.assertEqual(self.index.nearest("glucose and oxygen", k=1)[0][0], "fructose")
+
+    def test_truncated_svd_matches_dense_svd(self):
+        rng = np.random.default_rng(1)
+        dense = rng.random((30, 6)) * (rng.random((30, 6)) > 0.5)
+        rows, cols = np.nonzero(dense)
+        embedded = truncated_svd(rows, cols, dense[rows, cols], dense.shape, dims=6)
+        # Full-rank embeddings preserve every inner product between rows
+        np.testing.assert_allclose(embedded @ embedded.T, dense @ dense.T, atol=1e-4)
+
+    def test_top_k_matches_a_full_sort_on_a_large_index(self):
+        vectors = np.random.default_rng(0).standard_normal((20000, 64))
+        index = EmbeddingIndex([f"term{i}" for i in range(20000)], vectors)
+        for i in range(0, 20000, 1000):
+            scores = index.vectors @ index.vectors[i]
+            expected = [f"term{row}" for row in np.argsort(-scores, kind="stable") if row != i][:12]
+            self.assertEqual([label for label, _ in index.nearest(f"term{i}", k=12)], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import patch
+
+import firebaseConfig
+
+
+class TestFirebaseConfig(unittest.TestCase):
+    def setUp(self):
+        self._saved_client = firebaseConfig._client
+        firebaseConfig._client = None
+
+    def tearDown(self):
+        firebaseConfig._client = self._saved_client
+
+    @patch("firebaseConfig.firebase_admin")
+    @patch("firebaseConfig.firestore.client")
+    def test_get_db_builds_client_once(self, mock_client, mock_admin):
+        mock_admin._apps = {"[DEFAULT]": object()}
+
+        first = firebaseConfig.get_db()
+        second = firebaseConfig.get_db()
+
+        self.assertIs(first, second)
+        mock_client.assert_called_once()
+        mock_admin.initialize_app.assert_not_called()
+
+    @patch("firebaseConfig.get_db")
+    def test_lazy_db_forwards_to_shared_client(self, mock_get_db):
+        firebaseConfig.db.collection("users")
+        mock_get_db.return_value.collection.assert_called_once_with("users")
+
+    @patch("firebaseConfig.get_db")
+    def test_warm_up_swallows_errors(self, mock_get_db):
+        mock_get_db.return_value.collection.side_effect = RuntimeError("offline")
+        firebaseConfig.warm_up()
+        mock_get_db.return_value.collection.assert_called_once_with("users")
+
+
+if __name__ == "__main__":
+    unittest.main()
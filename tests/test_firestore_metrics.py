@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils import firestore_metrics
+
+
+def _doc(exists=True):
+    doc = MagicMock()
+    doc.exists = exists
+    return doc
+
+
+class TestFirestoreMetrics(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.db = firestore_metrics.instrument(self.client)
+
+    @patch("utils.firestore_metrics.ENABLED", True)
+    def test_counts_reads_writes_and_deletes(self):
+        self.client.collection.return_value.where.return_value.stream.return_value = [_doc(), _doc()]
+        self.client.collection.return_value.document.return_value.get.return_value = _doc(exists=False)
+        self.client.get_all.return_value = [_doc(), _doc(exists=False)]
+
+        with firestore_metrics.render_ledger() as ledger:
+            docs = list(self.db.collection("quizzes").where("teacher_id", "==", "t1").stream())
+            self.db.collection("users").document("u1").get()
+            list(self.db.get_all([self.db.collection("users").document("a"), "b"]))
+            self.db.collection("student_results").add({"score": 1})
+            batch = self.db.batch()
+            batch.update(self.db.collection("users").document("u1"), {"x": 1})
+            batch.delete(self.db.collection("quizzes").document("q1"))
+            batch.commit()
+
+        self.assertEqual(len(docs), 2)
+        totals = ledger.totals()
+        self.assertEqual(totals["reads"], 2 + 1 + 2)
+        self.assertEqual(totals["docs"], 2 + 0 + 1)
+        self.assertEqual(totals["writes"], 2)
+        self.assertEqual(totals["deletes"], 1)
+
+        ops = {row["op"] for row in ledger.rows()}
+        self.assertIn("quizzes.stream", ops)
+        self.assertIn("users.get", ops)
+        self.assertTrue(all(row["site"].startswith("test_firestore_metrics.py") for row in ledger.rows()))
+
+        # References passed into the real client are unwrapped
+        self.client.get_all.assert_called_once_with([self.client.collection.return_value.document.return_value, "b"])
+
+    @patch("utils.firestore_metrics.ENABLED", True)
+    def test_empty_query_costs_one_read(self):
+        self.client.collection.return_value.stream.return_value = []
+        with firestore_metrics.render_ledger() as ledger:
+            list(self.db.collection("quizzes").stream())
+        self.assertEqual(ledger.totals()["reads"], 1)
+
+    @patch("utils.firestore_metrics.ENABLED", False)
+    def test_disabled_yields_no_ledger(self):
+        with firestore_metrics.render_ledger() as ledger:
+            self.assertIsNone(ledger)
+
+    def test_calls_outside_a_render_are_not_recorded(self):
+        self.client.collection.return_value.stream.return_value = [_doc()]
+        self.assertEqual(len(list(self.db.collection("quizzes").stream())), 1)
+        self.assertIsNone(firestore_metrics.current_ledger())
+
+
+if __name__ == "__main__":
+    unittest.main()
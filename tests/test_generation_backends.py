@@ -0,0 +1,96 @@
+import contextlib
+import sys
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import openai
+
+from utils import generation_backends
+from utils.generation_backends import LocalSeq2SeqBackend, OpenAIBackend, get_backend, with_backoff
+
+
+def _fake_ml_modules():
+    tokenizer = MagicMock()
+    tokenizer.side_effect = lambda batch, **kwargs: {"input_ids": list(batch)}
+    tokenizer.batch_decode.side_effect = lambda generated, **kwargs: [f" out:{p} " for p in generated]
+    model = MagicMock()
+    model.generate.side_effect = lambda input_ids, **kwargs: input_ids
+
+    transformers = types.ModuleType("transformers")
+    transformers.AutoTokenizer = MagicMock()
+    transformers.AutoTokenizer.from_pretrained.return_value = tokenizer
+    transformers.AutoModelForSeq2SeqLM = MagicMock()
+    transformers.AutoModelForSeq2SeqLM.from_pretrained.return_value = model
+
+    torch = types.ModuleType("torch")
+    torch.no_grad = contextlib.nullcontext
+    return {"transformers": transformers, "torch": torch}, model
+
+
+class TestGenerationBackends(unittest.TestCase):
+    def setUp(self):
+        generation_backends._local_models.clear()
+
+    def test_local_backend_loads_model_once_and_batches_prompts(self):
+        modules, model = _fake_ml_modules()
+        with patch.dict(sys.modules, modules):
+            first = LocalSeq2SeqBackend(model="fake-t5", batch_size=2)
+            second = LocalSeq2SeqBackend(model="fake-t5", batch_size=2)
+
+            outputs = first.complete_many(["a", "b", "c"], max_tokens=50)
+            self.assertEqual(second.complete("d", max_tokens=50), "out:d")
+
+        self.assertEqual(outputs, ["out:a", "out:b", "out:c"])
+        modules["transformers"].AutoModelForSeq2SeqLM.from_pretrained.assert_called_once_with("fake-t5")
+        self.assertEqual(model.generate.call_count, 3)  # [a, b], [c], [d]
+        self.assertEqual(model.generate.call_args.kwargs["max_new_tokens"], 50)
+
+    @patch("utils.generation_backends.openai.ChatCompletion.create")
+    def test_openai_backend_complete(self, mock_create):
+        mock_create.return_value.choices = [MagicMock()]
+        mock_create.return_value.choices[0].message.content = "  {}  "
+
+        self.assertEqual(OpenAIBackend(model="gpt-test").complete("prompt", max_tokens=10), "{}")
+        self.assertEqual(mock_create.call_args.kwargs["model"], "gpt-test")
+
+    @patch("utils.generation_backends.openai.ChatCompletion.create")
+    def test_openai_backend_backs_off_on_rate_limits(self, mock_create):
+        ok = MagicMock()
+        ok.choices = [MagicMock()]
+        ok.choices[0].message.content = "{}"
+        mock_create.side_effect = [
+            openai.error.RateLimitError("slow down", headers={"retry-after": "3"}),
+            openai.error.ServiceUnavailableError("busy"),
+            ok,
+        ]
+        delays = []
+
+        with patch("utils.generation_backends.time.sleep", delays.append):
+            self.assertEqual(OpenAIBackend().complete("prompt", max_tokens=10), "{}")
+
+        self.assertEqual(delays[0], 3.0)  # the server's Retry-After wins
+        self.assertTrue(1.0 <= delays[1] <= 2.0)  # then exponential backoff with jitter
+
+    def test_with_backoff_gives_up_and_skips_permanent_errors(self):
+        delays = []
+        failing = MagicMock(side_effect=openai.error.Timeout("timeout"))
+        with self.assertRaises(openai.error.Timeout):
+            with_backoff(failing, attempts=3, sleep=delays.append)
+        self.assertEqual(failing.call_count, 3)
+        self.assertEqual(len(delays), 2)
+
+        bad_key = MagicMock(side_effect=openai.error.AuthenticationError("bad key"))
+        with self.assertRaises(openai.error.AuthenticationError):
+            with_backoff(bad_key, sleep=delays.append)
+        self.assertEqual(bad_key.call_count, 1)
+
+    def test_get_backend(self):
+        self.assertIs(get_backend("openai"), get_backend("openai"))
+        self.assertIsInstance(get_backend("local"), LocalSeq2SeqBackend)
+        with self.assertRaises(ValueError):
+            get_backend("nope")
+
+
+if __name__ == "__main__":
+    unittest.main()
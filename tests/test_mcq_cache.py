@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from utils.mcq_cache import MCQCache, cache_key
+
+
+class TestMCQCache(unittest.TestCase):
+    def test_key_depends_on_every_input(self):
+        base = cache_key("chunk", "model", "1", "temperature=0.7")
+        self.assertEqual(base, cache_key("chunk", "model", "1", "temperature=0.7"))
+        self.assertNotEqual(base, cache_key("chunk!", "model", "1", "temperature=0.7"))
+        self.assertNotEqual(base, cache_key("chunk", "other", "1", "temperature=0.7"))
+        self.assertNotEqual(base, cache_key("chunk", "model", "2", "temperature=0.7"))
+        self.assertNotEqual(base, cache_key("chunk", "model", "1", "temperature=0"))
+
+    def test_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "nested", "mcqs.sqlite3")
+            MCQCache(path).put("k", {"question": "Q?"})
+            cache = MCQCache(path)
+            self.assertEqual(cache.get("k"), {"question": "Q?"})
+            self.assertIsNone(cache.get("missing"))
+            self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_evicts_least_recently_used(self):
+        cache = MCQCache(":memory:", max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.put(key, {"q": key})
+        cache.get("a")  # a is now the most recently used
+        cache.put("d", {"q": "d"})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertLessEqual(cache.stats()["entries"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
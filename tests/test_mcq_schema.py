@@ -0,0 +1,46 @@
+import unittest
+
+from utils.mcq_schema import normalize, parse_response, validate
+
+VALID = {"question": "Which gas do plants release?", "options": ["Oxygen", "Nitrogen", "Argon", "Helium"],
+         "answer": "Oxygen"}
+
+
+class TestMCQSchema(unittest.TestCase):
+    def test_validate_accepts_a_well_formed_mcq(self):
+        self.assertEqual(validate(VALID), [])
+
+    def test_validate_reports_every_problem(self):
+        self.assertEqual(validate(None), ["the response is not a JSON object with question, options and answer"])
+        self.assertEqual(validate({**VALID, "question": "  "}), ['"question" must be a non-empty string'])
+        self.assertEqual(validate({**VALID, "options": VALID["options"][:3], "answer": ""}),
+                         ['"options" must be a list of exactly 4 strings', '"answer" must be a non-empty string'])
+        self.assertEqual(validate({**VALID, "options": ["Oxygen", "oxygen ", "Argon", "Helium"]}),
+                         ["the 4 options must all be different"])
+        self.assertEqual(validate({**VALID, "options": ["Oxygen", "", "Argon", "Helium"]}),
+                         ["every option must be a non-empty string"])
+        self.assertEqual(validate({**VALID, "answer": "Carbon"}), ['"answer" must be exactly one of the options'])
+
+    def test_parse_response_repairs_common_formatting(self):
+        self.assertEqual(parse_response('```json\n{"a": 1}\n```'), {"a": 1})
+        self.assertEqual(parse_response('Sure, here it is: {"a": [1, 2,],} Hope it helps!'), {"a": [1, 2]})
+        self.assertEqual(parse_response("{“a”: “b”}"), {"a": "b"})
+        self.assertEqual(parse_response("{'a': 'it\\'s'}"), {"a": "it's"})
+        self.assertEqual(parse_response('[{"question": "x {y}"}] trailing'), [{"question": "x {y}"}])
+        # The old .strip("```json") also ate these letters off the ends
+        self.assertEqual(parse_response('"json"'), "json")
+        self.assertIsNone(parse_response("no json here"))
+        self.assertIsNone(parse_response(None))
+
+    def test_normalize_fixes_labels_and_letter_answers(self):
+        item = normalize({"question": " Q? ", "options": {"A": "A) Oxygen", "B": "B) Argon", "C": "C) Neon", "D": "D) Helium"},
+                          "answer": "(b)"})
+        self.assertEqual(item, {"question": "Q?", "options": ["Oxygen", "Argon", "Neon", "Helium"], "answer": "Argon"})
+        self.assertEqual(normalize({**VALID, "answer": "oxygen"})["answer"], "Oxygen")
+        # Options that are themselves letters are left alone
+        letters = {"question": "Q?", "options": ["A", "B", "C", "D"], "answer": "B"}
+        self.assertEqual(normalize(letters), letters)
+
+
+if __name__ == "__main__":
+    unittest.main()
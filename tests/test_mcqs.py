@@ -2,9 +2,14 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import json
+import threading
+import time
 import unittest
-from unittest.mock import patch
-from utils.mcqs_generator import generate_mcqs
+from unittest.mock import MagicMock, patch
+from utils.dedup import NearDuplicateIndex
+from utils.mcq_cache import MCQCache
+from utils.mcqs_generator import FALLBACK_MCQ, _cached_mcq, in_document_order, generate_mcqs, generate_question_answer, generate_question_answers_batch, iter_mcqs
 
 class TestMCQGeneration(unittest.TestCase):
     def setUp(self):
@@ -13,25 +18,21 @@ class TestMCQGeneration(unittest.TestCase):
             "This process primarily occurs in the chloroplasts of plant cells using chlorophyll. "
             "Carbon dioxide and water are converted into glucose and oxygen."
         )
+        cache_patcher = patch("utils.mcq_cache.default_cache", MCQCache(":memory:"))
+        self.cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
 
-    @patch("utils.mcqs_generator.call_question_generation_pipeline")
-    @patch("utils.mcqs_generator.call_question_answering_pipeline")
-    def test_generate_mcqs_structure(self, mock_answering, mock_questioning):
-        mock_questioning.return_value = [
-            "What is photosynthesis?",
-            "Where does photosynthesis occur?",
-            "What is the role of chlorophyll?"
-        ]
-        mock_answering.side_effect = [
-            "Photosynthesis is the process of converting sunlight into energy.",
-            "In the chloroplasts of plant cells.",
-            "Chlorophyll captures light energy."
-        ]
+    @patch("utils.mcqs_generator.generate_question_answer")
+    def test_generate_mcqs_structure(self, mock_generate):
+        mock_generate.side_effect = lambda chunk, **kwargs: {
+            "question": f"What does this describe? {chunk[:20]}",
+            "options": ["Photosynthesis", "Respiration", "Digestion", "Osmosis"],
+            "answer": "Photosynthesis",
+        }
 
-        num_questions = 3
-        mcqs = generate_mcqs(self.sample_text, num_questions=num_questions)
+        mcqs = generate_mcqs(self.sample_text, num_questions=3)
 
-        self.assertEqual(len(mcqs), num_questions)
+        self.assertGreaterEqual(len(mcqs), 1)
         for mcq in mcqs:
             self.assertIn("question", mcq)
             self.assertIn("answer", mcq)
@@ -39,5 +40,285 @@ class TestMCQGeneration(unittest.TestCase):
             self.assertEqual(len(mcq["options"]), 4)
             self.assertIn(mcq["answer"], mcq["options"])
 
+    @patch("utils.mcqs_generator.generate_question_answer")
+    def test_generate_mcqs_runs_chunks_concurrently_in_order(self, mock_generate):
+        text = ". ".join(f"Sentence number {i} talks about topic {i} " + "x" * 400 for i in range(4))
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def fake(chunk, **kwargs):
+            with lock:
+                in_flight.append(chunk)
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.remove(chunk)
+            return {"question": chunk, "options": ["A", "B", "C", "D"], "answer": "A"}
+
+        mock_generate.side_effect = fake
+
+        mcqs = generate_mcqs(text, num_questions=4, max_workers=4, batch_size=1)
+
+        self.assertEqual(len(mcqs), 4)
+        for i, mcq in enumerate(mcqs):
+            self.assertIn(f"Sentence number {i}", mcq["question"])
+        self.assertGreater(max(peak), 1)
+
+    @patch("utils.mcqs_generator.generate_question_answer")
+    @patch("utils.mcqs_generator.openai.ChatCompletion.create")
+    def test_batch_mode_repairs_invalid_items_with_a_short_fix_request(self, mock_create, mock_generate):
+        good = {"question": "Q1?", "options": ["A", "B", "C", "D"], "answer": "B"}
+        bad = {"question": "", "options": ["A", "B", "C", "D"], "answer": "C"}
+        fixed = {"question": "Q2 fixed?", "options": ["A", "B", "C", "D"], "answer": "C"}
+        responses = ["```json" + json.dumps([good, bad]) + "```", "Sure! " + json.dumps(fixed)]
+        mock_create.side_effect = lambda **kwargs: MagicMock(
+            choices=[MagicMock(message=MagicMock(content=responses.pop(0)))]
+        )
+
+        mcqs = generate_question_answers_batch(["chunk one", "chunk two"])
+
+        self.assertEqual(mcqs, [good, fixed])
+        self.assertEqual(mock_create.call_count, 2)
+        fix_prompt = mock_create.call_args.kwargs["messages"][0]["content"]
+        self.assertIn('"question" must be a non-empty string', fix_prompt)
+        self.assertNotIn("chunk two", fix_prompt)
+        mock_generate.assert_not_called()
+
+    @patch("utils.mcqs_generator.generate_question_answer")
+    @patch("utils.mcqs_generator._chat")
+    def test_batch_mode_matches_items_to_passages_when_one_is_dropped(self, mock_chat, mock_generate):
+        chunks = ["passage one text", "passage two text", "passage three text"]
+        second = {"passage": 2, "question": "Q2?", "options": ["A", "B", "C", "D"], "answer": "A"}
+        third = {"passage": 3, "question": "Q3?", "options": ["A", "B", "C", "D"], "answer": "B"}
+        regenerated = {"question": "Q1?", "options": ["A", "B", "C", "D"], "answer": "C"}
+        mock_generate.return_value = regenerated
+
+        mock_chat.return_value = json.dumps([second, third])
+        mcqs = generate_question_answers_batch(chunks)
+
+        self.assertEqual([m["question"] for m in mcqs], ["Q1?", "Q2?", "Q3?"])
+        self.assertNotIn("passage", mcqs[1])
+        self.assertEqual(mock_generate.call_args.args[0], "passage one text")
+        self.assertIsNone(_cached_mcq("passage one text"))
+        self.assertEqual(_cached_mcq("passage two text")["question"], "Q2?")
+
+        # Without passage numbers, a short array can't be matched at all
+        mock_generate.reset_mock()
+        mock_chat.return_value = json.dumps([
+            {k: v for k, v in item.items() if k != "passage"} for item in (second, third)
+        ])
+        generate_question_answers_batch(["other one", "other two", "other three"])
+        self.assertEqual([c.args[0] for c in mock_generate.call_args_list], ["other one", "other two", "other three"])
+
+    @patch("utils.mcqs_generator._chat")
+    def test_local_repair_avoids_model_calls(self, mock_chat):
+        mock_chat.return_value = (
+            "Here you go:\n```json\n{'question': 'Which organelle makes ATP?', "
+            "'options': ['A) Ribosome', 'B) Mitochondrion', 'C) Nucleus', 'D) Vacuole',], 'answer': 'B'}\n```"
+        )
+
+        mcq = generate_question_answer("chunk")
+
+        self.assertEqual(mcq, {
+            "question": "Which organelle makes ATP?",
+            "options": ["Ribosome", "Mitochondrion", "Nucleus", "Vacuole"],
+            "answer": "Mitochondrion",
+        })
+        mock_chat.assert_called_once()
+
+    @patch("utils.mcqs_generator._chat")
+    def test_unfixable_responses_fall_back_after_fix_requests(self, mock_chat):
+        mock_chat.return_value = "I cannot help with that."
+
+        self.assertEqual(generate_question_answer("chunk", retries=2), FALLBACK_MCQ)
+        # One generation plus two fix requests, never the whole prompt again
+        self.assertEqual(mock_chat.call_count, 3)
+        self.assertNotIn("chunk", mock_chat.call_args_list[-1].args[0])
+
+    @patch("utils.mcqs_generator.openai.ChatCompletion.create")
+    def test_cached_chunk_skips_the_llm(self, mock_create):
+        mcq = {"question": "Q?", "options": ["A", "B", "C", "D"], "answer": "A"}
+        mock_create.return_value.choices = [MagicMock()]
+        mock_create.return_value.choices[0].message.content = json.dumps(mcq)
+
+        self.assertEqual(generate_question_answer("same chunk"), mcq)
+        self.assertEqual(generate_question_answer("same chunk"), mcq)
+        self.assertEqual(generate_question_answers_batch(["same chunk"]), [mcq])
+
+        mock_create.assert_called_once()
+        self.assertEqual(self.cache.stats()["hits"], 2)
+
+    @patch("utils.mcqs_generator.generate_question_answers_batch")
+    def test_generate_mcqs_groups_chunks_into_batches(self, mock_batch):
+        text = ". ".join(f"Sentence number {i} talks about topic {i} " + "x" * 400 for i in range(5))
+        mock_batch.side_effect = lambda chunks, **kwargs: [{"question": c} for c in chunks]
+
+        mcqs = generate_mcqs(text, num_questions=5, batch_size=2)
+
+        self.assertEqual([len(c.args[0]) for c in mock_batch.call_args_list], [2, 2, 1])
+        for i, mcq in enumerate(mcqs):
+            self.assertIn(f"Sentence number {i}", mcq["question"])
+
+    @patch("utils.mcqs_generator.generate_question_answers_batch")
+    def test_iter_mcqs_yields_in_completion_order(self, mock_batch):
+        text = ". ".join(f"Sentence number {i} talks about topic {i} " + "x" * 400 for i in range(2))
+        release = threading.Event()
+
+        def fake(chunks, **kwargs):
+            if "Sentence number 0" in chunks[0]:
+                # The first chunk only finishes once the second one has been yielded
+                release.wait(timeout=5)
+            return [{"question": c} for c in chunks]
+
+        mock_batch.side_effect = fake
+
+        stream = iter_mcqs(text, num_questions=2, batch_size=1)
+        first = next(stream)
+        release.set()
+        rest = list(stream)
+
+        self.assertIn("Sentence number 1", first["question"])
+        self.assertIn("Sentence number 0", rest[0]["question"])
+
+        # Chunk order is restored once the stream is done, without the tag
+        ordered = in_document_order([first] + rest)
+        self.assertEqual([m["question"] for m in ordered], [rest[0]["question"], first["question"]])
+        self.assertNotIn("chunk_index", ordered[0])
+
+    @patch("utils.mcqs_generator.get_backend")
+    def test_local_backend_writes_questions_for_locally_chosen_answers(self, mock_get_backend):
+        backend = MagicMock(batched_inference=True, model_name="local-t5", temperature=0.0)
+        mock_get_backend.return_value = backend
+        backend.complete_many.side_effect = lambda prompts, max_tokens: [
+            "What does this part of the cell do" if i else "" for i in range(len(prompts))
+        ]
+        text = " ".join([
+            "Mitochondria perform cellular respiration and release energy stored in glucose molecules.",
+            "Chloroplasts capture sunlight and convert carbon dioxide into glucose for the plant.",
+            "Ribosomes translate messenger RNA into proteins inside the cytoplasm of every cell.",
+        ] * 6)
+
+        mcqs = generate_mcqs(text, num_questions=2)
+
+        # One batched call, no JSON to parse and no fix requests
+        backend.complete_many.assert_called_once()
+        backend.complete.assert_not_called()
+        prompts = backend.complete_many.call_args.args[0]
+        self.assertEqual(len(prompts), 2)
+        self.assertEqual(len(mcqs), 2)
+        for prompt, mcq in zip(prompts, mcqs):
+            self.assertIn(f'whose answer is "{mcq["answer"]}"', prompt)
+            self.assertEqual(len({o.lower() for o in mcq["options"]}), 4)
+            self.assertIn(mcq["answer"], mcq["options"])
+        # An empty output keeps the cloze question
+        self.assertIn("_____", mcqs[0]["question"])
+        self.assertEqual(mcqs[1]["question"], "What does this part of the cell do?")
+
+    @patch("utils.mcqs_generator.generate_question_answers_batch")
+    def test_failed_generations_fall_back_to_cloze_questions(self, mock_batch):
+        text = " ".join([
+            "Mitochondria perform cellular respiration and release energy stored in glucose molecules.",
+            "Chloroplasts capture sunlight and convert carbon dioxide into glucose for the plant.",
+            "Ribosomes translate messenger RNA into proteins inside the cytoplasm of every cell.",
+        ] * 3)
+        mock_batch.side_effect = lambda chunks, **kwargs: [dict(FALLBACK_MCQ) for _ in chunks]
+
+        mcqs = generate_mcqs(text, num_questions=2)
+
+        self.assertTrue(mcqs)
+        for mcq in mcqs:
+            self.assertIn("_____", mcq["question"])
+            self.assertIn(mcq["answer"], mcq["options"])
+
+    @patch("utils.mcqs_generator.generate_question_answers_batch")
+    def test_weak_options_are_topped_up_from_the_document(self, mock_batch):
+        text = " ".join([
+            "Mitochondria perform cellular respiration and release energy stored in glucose molecules.",
+            "Chloroplasts capture sunlight and convert carbon dioxide into glucose for the plant.",
+            "Ribosomes translate messenger RNA into proteins inside the cytoplasm of every cell.",
+        ] * 3)
+        weak = {"question": "What do chloroplasts make?", "options": ["glucose", "oxygen", "oxygen"], "answer": "glucose"}
+        mock_batch.side_effect = lambda chunks, **kwargs: [dict(weak) for _ in chunks]
+
+        mcqs = generate_mcqs(text, num_questions=1)
+
+        self.assertEqual(mcqs[0]["question"], weak["question"])
+        self.assertEqual(len({o.lower() for o in mcqs[0]["options"]}), 4)
+        self.assertIn("glucose", mcqs[0]["options"])
+        self.assertIn("oxygen", mcqs[0]["options"])
+
+    @patch("utils.mcqs_generator._chat")
+    def test_answer_missing_from_options_is_sent_back_then_replaced_by_cloze(self, mock_chat):
+        text = " ".join([
+            "Mitochondria perform cellular respiration and release energy stored in glucose molecules.",
+            "Chloroplasts capture sunlight and convert carbon dioxide into glucose for the plant.",
+            "Ribosomes translate messenger RNA into proteins inside the cytoplasm of every cell.",
+        ] * 3)
+        mock_chat.return_value = json.dumps({
+            "question": "Which organelle releases energy from glucose?",
+            "options": ["Mitochondria", "Ribosome", "Nucleus", "Chloroplast"],
+            "answer": "The mitochondria",
+        })
+
+        self.assertEqual(generate_question_answer("chunk", retries=1), FALLBACK_MCQ)
+        self.assertIn('"answer" must be exactly one of the options', mock_chat.call_args.args[0])
+
+        mock_chat.reset_mock()
+        mcqs = generate_mcqs(text, num_questions=1)
+
+        # One generation plus two fix requests, then a cloze question instead of two correct options
+        self.assertEqual(mock_chat.call_count, 3)
+        self.assertIn("_____", mcqs[0]["question"])
+        self.assertIn(mcqs[0]["answer"], mcqs[0]["options"])
+        self.assertNotIn("The mitochondria", mcqs[0]["options"])
+
+    @patch("utils.mcqs_generator._chat")
+    def test_generate_question_answer_never_returns_weak_options(self, mock_chat):
+        weak = {"question": "What do chloroplasts make?", "options": ["glucose", "oxygen", "oxygen"], "answer": "glucose"}
+        mock_chat.return_value = json.dumps(weak)
+
+        self.assertEqual(generate_question_answer("chunk", retries=1), FALLBACK_MCQ)
+        self.assertEqual(generate_question_answer("chunk", retries=0, use_cache=False, keep_weak=True), weak)
+
+    @patch("utils.mcqs_generator.generate_question_answers_batch")
+    def test_near_duplicates_are_regenerated_from_spare_chunks(self, mock_batch):
+        text = ". ".join(f"Sentence number {i} talks about topic {i} " + "x" * 400 for i in range(6))
+        bank = NearDuplicateIndex()
+        bank.add(("quiz", 0), "Which process turns sunlight into chemical energy in plants?")
+
+        def fake(chunks, **kwargs):
+            mcqs = []
+            for chunk in chunks:
+                topic = chunk.split()[2]
+                question = {
+                    "0": "What is the powerhouse of the cell?",
+                    "1": "What is the powerhouse of the cell ?",
+                    "2": "Which process turns sunlight into chemical energy in plants",
+                }.get(topic, f"What does topic {topic} describe?")
+                mcqs.append({"question": question, "options": ["A", "B", "C", "D"], "answer": "A"})
+            return mcqs
+
+        mock_batch.side_effect = fake
+
+        mcqs = generate_mcqs(text, num_questions=3, batch_size=1, existing=bank)
+
+        # Topics 0, 2 and 4 go first; topic 2 is already in the bank, and its first
+        # replacement (topic 1) repeats topic 0, so only that slot takes two more chunks
+        self.assertEqual(
+            [m["question"] for m in mcqs],
+            ["What is the powerhouse of the cell?", "What does topic 3 describe?", "What does topic 4 describe?"],
+        )
+        self.assertEqual(sum(len(c.args[0]) for c in mock_batch.call_args_list), 5)
+
+        streamed = [m["question"] for m in iter_mcqs(text, num_questions=3, batch_size=1, existing=bank)]
+        self.assertEqual(sorted(streamed), sorted(m["question"] for m in mcqs))
+
+    def test_iter_mcqs_without_content(self):
+        self.assertEqual(
+            [m["question"] for m in iter_mcqs("too short", num_questions=2)],
+            ["No valid content found in PDF to generate questions."],
+        )
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,33 +1,184 @@
+import io
+import os
 import unittest
 from unittest.mock import MagicMock, patch
+
+import fitz
+
 from utils import pdf_utils  # your utils/pdf_utils.py file
+from utils.pdf_cache import PDFTextCache
+
+
+def _make_pdf(pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 300), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
 
 class TestPdfUtils(unittest.TestCase):
+    def setUp(self):
+        cache_patcher = patch("utils.pdf_cache.default_cache", PDFTextCache(":memory:"))
+        self.cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
 
     @patch('fitz.open')
     def test_extract_text_from_pdf(self, mock_fitz_open):
         # Mock the PDF document and pages
         mock_page1 = MagicMock()
-        mock_page1.get_text.return_value = "Page 1 text. "
+        mock_page1.rect.height = 800
+        mock_page1.get_text.return_value = [(72, 300, 500, 320, "Page 1 text.\n", 0, 0)]
         mock_page2 = MagicMock()
-        mock_page2.get_text.return_value = "Page 2 text."
+        mock_page2.rect.height = 800
+        mock_page2.get_text.return_value = [(72, 300, 500, 320, "Page 2 text.", 0, 0), (0, 0, 9, 9, "<image>", 1, 1)]
 
+        pages = [mock_page1, mock_page2]
         mock_doc = MagicMock()
-        mock_doc.__enter__.return_value = [mock_page1, mock_page2]  # context manager returns list of pages
+        mock_doc.__enter__.return_value.page_count = len(pages)
+        mock_doc.__enter__.return_value.__getitem__.side_effect = pages.__getitem__
+
+        opened = []
 
-        mock_fitz_open.return_value = mock_doc
+        def fake_open(path):
+            # The upload has been spooled to a temp file by the time fitz opens it
+            with open(path, "rb") as f:
+                opened.append((path, f.read()))
+            return mock_doc
 
-        # Mock uploaded_file with read method returning bytes
-        mock_file = MagicMock()
-        mock_file.read.return_value = b"%PDF-1.4 fake pdf content"
+        mock_fitz_open.side_effect = fake_open
+
+        # Uploaded files are file-like objects (Streamlit's UploadedFile is a BytesIO)
+        mock_file = io.BytesIO(b"%PDF-1.4 fake pdf content")
 
         result = pdf_utils.extract_text_from_pdf(mock_file)
 
-        # Check if text is concatenated from both pages
-        self.assertEqual(result, "Page 1 text. Page 2 text.")
+        # Check if text is concatenated from both pages, line by line
+        self.assertEqual(result, "Page 1 text.\nPage 2 text.\n")
+        mock_page1.get_text.assert_called_once_with("blocks")
+
+        # fitz opened the spooled file by path, and the temp file is gone afterwards
+        self.assertEqual(len(opened), 1)
+        path, content = opened[0]
+        self.assertEqual(content, b"%PDF-1.4 fake pdf content")
+        self.assertFalse(os.path.exists(path))
+
+    def test_iter_page_texts_is_lazy(self):
+        upload = io.BytesIO(_make_pdf(["First page", "Second page", "Third page"]))
+
+        pages = pdf_utils.iter_page_texts(upload)
+        self.assertIn("First page", next(pages))
+        self.assertEqual([p.strip() for p in pages], ["Second page", "Third page"])
+
+    def test_extract_text_from_real_pdf_and_path(self):
+        data = _make_pdf([f"Page number {i}" for i in range(50)])
+
+        text = pdf_utils.extract_text_from_pdf(io.BytesIO(data))
+        self.assertEqual(text.split("\n")[:2], ["Page number 0", "Page number 1"])
+        self.assertIn("Page number 49", text)
+
+        spooled = io.BytesIO(data)
+        with pdf_utils.spooled_pdf(spooled) as path:
+            self.assertEqual(pdf_utils.extract_text_from_pdf(path), text)
+
+    def test_repeated_uploads_skip_fitz(self):
+        data = _make_pdf(["Chapter one", "Chapter two"])
+        text = pdf_utils.extract_text_from_pdf(io.BytesIO(data))
+
+        with patch("fitz.open") as mock_fitz_open:
+            self.assertEqual(pdf_utils.extract_text_from_pdf(io.BytesIO(data)), text)
+        mock_fitz_open.assert_not_called()
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+        # Different bytes are a different entry
+        pdf_utils.extract_text_from_pdf(io.BytesIO(_make_pdf(["Chapter three"])))
+        self.assertEqual(self.cache.stats()["entries"], 2)
+
+    def test_headers_and_footers_are_stripped_with_a_report(self):
+        doc = fitz.open()
+        for i in range(5):
+            page = doc.new_page()
+            page.insert_text((72, 40), "Intro to Biology - Unit 1")
+            page.insert_text((72, 300), f"Cells are the unit of life, fact {i}.")
+            page.insert_text((290, 820), str(i + 1))
+        data = doc.tobytes()
+        doc.close()
+
+        text, report = pdf_utils.extract_text_with_report(io.BytesIO(data))
+
+        self.assertEqual(text.splitlines(), [f"Cells are the unit of life, fact {i}." for i in range(5)])
+        self.assertEqual(report["lines_removed"], 10)
+        self.assertGreater(report["tokens_saved"], 0)
+        self.assertIn("Intro to Biology", "".join(pdf_utils.iter_page_texts(io.BytesIO(data))))
+
+    def test_outline_and_chapter_range_extraction(self):
+        doc = fitz.open()
+        for i in range(12):
+            doc.new_page().insert_text((72, 300), f"Page number {i}")
+        doc.set_toc([[1, "Biology", 1], [2, "Cells", 1], [2, "Plants", 5], [2, "Animals", 9]])
+        data = doc.tobytes()
+        doc.close()
+
+        with patch.object(pdf_utils, "page_lines", wraps=pdf_utils.page_lines) as lines:
+            outline = pdf_utils.read_outline(io.BytesIO(data))
+        lines.assert_not_called()
+        self.assertEqual(outline, {
+            "page_count": 12,
+            "chapters": [("Cells", 0, 4), ("Plants", 4, 8), ("Animals", 8, 12)],
+        })
+
+        with patch.object(pdf_utils, "page_lines", wraps=pdf_utils.page_lines) as lines:
+            text = pdf_utils.extract_text_from_pdf(io.BytesIO(data), page_range=(4, 8))
+        self.assertEqual(text.splitlines(), [f"Page number {i}" for i in range(4, 8)])
+        # Only the chosen pages were read
+        self.assertEqual(lines.call_count, 4)
+
+        # Each range is cached on its own
+        self.assertNotEqual(pdf_utils.extract_text_from_pdf(io.BytesIO(data), page_range=(8, 20)), text)
+        self.assertEqual(pdf_utils.extract_text_from_pdf(io.BytesIO(data), page_range=(4, 8)), text)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+
+    def test_chapters_from_toc_edge_cases(self):
+        self.assertEqual(pdf_utils.chapters_from_toc([], 10), [])
+        self.assertEqual(
+            pdf_utils.chapters_from_toc([[1, " Intro ", 1], [1, "Broken link", 99], [1, "Body", 3]], 10),
+            [("Intro", 0, 2), ("Body", 2, 10)],
+        )
+
+    def test_page_ranges_cover_every_page_once(self):
+        ranges = pdf_utils.page_ranges(500, 4)
+        self.assertEqual(ranges[0], (0, 32))
+        self.assertEqual(ranges[-1][1], 500)
+        self.assertEqual(sum(b - a for a, b in ranges), 500)
+        self.assertEqual(pdf_utils.page_ranges(15, 4), [(0, 10), (10, 15)])
+
+    def test_large_documents_are_extracted_in_worker_processes(self):
+        data = _make_pdf([f"Page number {i}" for i in range(40)])
+        serial = pdf_utils.extract_text_from_pdf(io.BytesIO(data))
+
+        with patch.object(pdf_utils, "PDF_PARALLEL_MIN_PAGES", 20), patch.object(pdf_utils, "PDF_WORKERS", 2), \
+                patch("utils.pdf_cache.default_cache", None):
+            self.addCleanup(pdf_utils._reset_pool)
+            parallel = pdf_utils.extract_text_from_pdf(io.BytesIO(data))
+            self.assertIsNotNone(pdf_utils._pool)
+
+        self.assertEqual(parallel, serial)
+
+    @patch("utils.pdf_utils._get_pool")
+    def test_broken_pool_finishes_remaining_pages_here(self, mock_get_pool):
+        from concurrent.futures.process import BrokenProcessPool
+
+        def broken_map(fn, paths, starts, stops):
+            yield pdf_utils._extract_range(paths[0], starts[0], stops[0])
+            raise BrokenProcessPool("worker died")
+
+        mock_get_pool.return_value.map.side_effect = broken_map
+        data = _make_pdf([f"Page number {i}" for i in range(25)])
+
+        pages = list(pdf_utils.iter_page_texts(io.BytesIO(data), parallel=True))
 
-        # Verify fitz.open called with stream=bytes and filetype='pdf'
-        mock_fitz_open.assert_called_once_with(stream=mock_file.read.return_value, filetype="pdf")
+        self.assertEqual([p.strip() for p in pages], [f"Page number {i}" for i in range(25)])
 
 if __name__ == "__main__":
     unittest.main()
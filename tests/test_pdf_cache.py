@@ -0,0 +1,66 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import zlib
+
+from utils.pdf_cache import PDFTextCache, cache_key, file_sha256
+
+
+class TestPDFTextCache(unittest.TestCase):
+    def test_file_sha256_streams_and_rewinds(self):
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        upload = io.BytesIO(data)
+        upload.read(10)
+
+        self.assertEqual(file_sha256(upload), hashlib.sha256(data).hexdigest())
+        self.assertEqual(upload.tell(), 0)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.pdf")
+            with open(path, "wb") as f:
+                f.write(data)
+            self.assertEqual(file_sha256(path), hashlib.sha256(data).hexdigest())
+
+    def test_key_depends_on_content_version_and_options(self):
+        base = cache_key("abc")
+        self.assertEqual(base, cache_key("abc"))
+        self.assertNotEqual(base, cache_key("abd"))
+        self.assertNotEqual(base, cache_key("abc", "0"))
+        self.assertNotEqual(base, cache_key("abc", first_page=3))
+
+    def test_persists_compressed_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "nested", "pdf_text.sqlite3")
+            pages = ["Photosynthesis " * 500, "Ünïcode page"]
+            PDFTextCache(path).put("k", pages)
+            cache = PDFTextCache(path)
+            self.assertEqual(cache.get("k"), pages)
+            self.assertIsNone(cache.get("missing"))
+            stats = cache.stats()
+            self.assertEqual(stats["hit_rate"], 0.5)
+            self.assertLess(stats["bytes"], len(pages[0]) // 10)
+
+    def test_evicts_least_recently_used_by_size(self):
+        pages = {key: [os.urandom(500).hex()] for key in ("a", "b", "c", "d")}
+        size = max(len(zlib.compress(json.dumps(p).encode("utf-8"))) for p in pages.values())
+        cache = PDFTextCache(":memory:", max_bytes=size * 7 // 2)
+        for key in ("a", "b", "c"):
+            cache.put(key, pages[key])
+        cache.get("a")  # a is now the most recently used
+        cache.put("d", pages["d"])
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), pages["a"])
+        self.assertEqual(cache.get("d"), pages["d"])
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes)
+
+        # An entry bigger than the whole cache is not stored
+        cache.put("huge", [os.urandom(8 * size).hex()])
+        self.assertIsNone(cache.get("huge"))
+
+
+if __name__ == "__main__":
+    unittest.main()
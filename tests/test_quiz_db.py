@@ -5,7 +5,7 @@ from datetime import datetime, timezone
 from utils import quiz_db
 
 class TestQuizDB(unittest.TestCase):
-    @patch('utils.quiz_db.firestore.client')
+    @patch('utils.quiz_db.get_db')
     def test_create_quiz(self, mock_client):
         mock_db = MagicMock()
         mock_client.return_value = mock_db
@@ -34,5 +34,15 @@ class TestQuizDB(unittest.TestCase):
         self.assertEqual(doc_data["duration"], 30)
         self.assertIsInstance(doc_data["created_at"], datetime)
 
+    def test_to_utc_datetime(self):
+        self.assertEqual(
+            quiz_db.to_utc_datetime("2025-05-25T10:00:00"),
+            datetime(2025, 5, 25, 10, 0, tzinfo=timezone.utc),
+        )
+        self.assertEqual(
+            quiz_db.to_utc_datetime("2025-05-25T12:00:00+02:00"),
+            datetime(2025, 5, 25, 10, 0, tzinfo=timezone.utc),
+        )
+
 if __name__ == "__main__":
     unittest.main()
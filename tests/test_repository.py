@@ -0,0 +1,157 @@
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from utils import repository
+from utils.repository import TTLCache
+
+
+def _doc(doc_id, data, exists=True):
+    doc = MagicMock()
+    doc.id = doc_id
+    doc.exists = exists
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hits_misses_and_expiry(self):
+        cache = TTLCache(maxsize=10, ttl=0.05)
+        cache.set("k", 1)
+        self.assertEqual(cache.get("k"), 1)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("k", None))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b", None))
+
+
+class TestRepository(unittest.TestCase):
+    def setUp(self):
+        repository.clear_cache()
+
+    def test_get_user_is_read_through(self):
+        mock_db = MagicMock()
+        mock_db.collection.return_value.document.return_value.get.return_value = _doc("u1", {"name": "Ann"})
+
+        self.assertEqual(repository.get_user(mock_db, "u1"), {"name": "Ann"})
+        self.assertEqual(repository.get_user(mock_db, "u1"), {"name": "Ann"})
+
+        mock_db.collection.return_value.document.return_value.get.assert_called_once()
+        self.assertEqual(repository.cache_stats()["hits"], 1)
+
+    def test_get_users_only_fetches_misses(self):
+        mock_db = MagicMock()
+        mock_db.collection.return_value.document.return_value.get.return_value = _doc("u1", {"name": "Ann"})
+        repository.get_user(mock_db, "u1")
+        mock_db.get_all.return_value = [_doc("u2", {"name": "Bob"})]
+
+        users = repository.get_users(mock_db, ["u1", "u2", "u3"])
+
+        self.assertEqual(users, {"u1": {"name": "Ann"}, "u2": {"name": "Bob"}})
+        self.assertEqual(len(mock_db.get_all.call_args[0][0]), 2)
+        repository.get_users(mock_db, ["u2", "u3"])
+        mock_db.get_all.assert_called_once()
+
+    def test_add_result_invalidates_result_lists(self):
+        mock_db = MagicMock()
+        query = mock_db.collection.return_value.where.return_value
+        query.stream.return_value = []
+        repository.list_results_for_student(mock_db, "s1")
+        repository.list_results_for_student(mock_db, "s1")
+        self.assertEqual(query.stream.call_count, 1)
+
+        repository.add_result(mock_db, {"student_id": "s1", "quiz_id": "q1"})
+        query.stream.return_value = [_doc("r1", {"student_id": "s1", "quiz_id": "q1"})]
+
+        self.assertEqual(
+            repository.list_results_for_student(mock_db, "s1"),
+            [("r1", {"student_id": "s1", "quiz_id": "q1"})],
+        )
+        self.assertEqual(query.stream.call_count, 2)
+
+    def test_open_quizzes_cached_per_minute_cutoff(self):
+        mock_db = MagicMock()
+        query = mock_db.collection.return_value.where.return_value
+        query.where.return_value.select.return_value.stream.return_value = []
+
+        repository.list_open_quizzes_for_teacher(mock_db, "t1", datetime(2025, 1, 1, 10, 0, 5, tzinfo=timezone.utc))
+        repository.list_open_quizzes_for_teacher(mock_db, "t1", datetime(2025, 1, 1, 10, 0, 50, tzinfo=timezone.utc))
+        query.where.assert_called_once_with("end_time", ">=", datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc))
+
+        repository.add_quiz(mock_db, {"teacher_id": "t1"})
+        repository.list_open_quizzes_for_teacher(mock_db, "t1", datetime(2025, 1, 1, 10, 0, 50, tzinfo=timezone.utc))
+        self.assertEqual(query.where.return_value.select.return_value.stream.call_count, 2)
+
+    def test_get_quiz_questions_reads_only_questions(self):
+        mock_db = MagicMock()
+        doc_ref = mock_db.collection.return_value.document.return_value
+        doc_ref.get.return_value = _doc("q1", {"questions": [{"question": "2 + 2?"}]})
+
+        self.assertEqual(repository.get_quiz_questions(mock_db, "q1"), [{"question": "2 + 2?"}])
+        repository.get_quiz_questions(mock_db, "q1")
+        doc_ref.get.assert_called_once_with(field_paths=["questions"])
+
+        repository.delete_quizzes(mock_db, "t1", ["q1"])
+        repository.get_quiz_questions(mock_db, "q1")
+        self.assertEqual(doc_ref.get.call_count, 2)
+
+    def test_questions_for_quizzes_use_get_all_and_bypass_the_cache(self):
+        mock_db = MagicMock()
+        mock_db.collection.return_value.document.side_effect = lambda quiz_id: quiz_id
+        mock_db.get_all.side_effect = lambda refs, field_paths: [
+            _doc(ref, {"questions": [{"question": f"{ref}?"}]}) for ref in refs
+        ]
+        before = repository.cache_stats()
+
+        self.assertEqual(repository.get_questions_for_quizzes(mock_db, ["q1", "q2", "q1"]),
+                         {"q1": [{"question": "q1?"}], "q2": [{"question": "q2?"}]})
+        mock_db.get_all.assert_called_once_with(["q1", "q2"], field_paths=["questions"])
+        self.assertEqual(repository.cache_stats(), before)
+
+    def test_failed_deletes_still_invalidate(self):
+        mock_db = MagicMock()
+        query = mock_db.collection.return_value.where.return_value
+        query.stream.return_value = [_doc("r1", {"student_id": "s1", "quiz_id": "q1"})]
+        results = repository.list_results_for_quiz(mock_db, "q1")
+        mock_db.batch.return_value.commit.side_effect = RuntimeError("quota exceeded")
+
+        with self.assertRaises(RuntimeError):
+            repository.delete_results(mock_db, results)
+        repository.list_results_for_quiz(mock_db, "q1")
+        self.assertEqual(query.stream.call_count, 2)
+
+        summaries = mock_db.collection.return_value.where.return_value.select.return_value
+        repository.list_quizzes_for_teacher(mock_db, "t1")
+        with self.assertRaises(RuntimeError):
+            repository.delete_quizzes(mock_db, "t1", ["q1"])
+        repository.list_quizzes_for_teacher(mock_db, "t1")
+        self.assertEqual(summaries.stream.call_count, 2)
+
+    def test_accept_request_invalidates_teacher_views(self):
+        mock_db = MagicMock()
+        query = mock_db.collection.return_value.where.return_value
+        query.stream.return_value = []
+        query.where.return_value.stream.return_value = []
+        repository.list_students_for_teacher(mock_db, "t1")
+        repository.list_pending_requests_for_teacher(mock_db, "t1")
+
+        repository.accept_teacher_request(mock_db, "req1", {"student_id": "s1", "teacher_id": "t1"})
+        repository.list_students_for_teacher(mock_db, "t1")
+        repository.list_pending_requests_for_teacher(mock_db, "t1")
+
+        self.assertEqual(query.stream.call_count, 2)
+        self.assertEqual(query.where.return_value.stream.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
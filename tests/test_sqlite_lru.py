@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from utils.sqlite_lru import SQLiteLRUStore
+
+
+class TestSQLiteLRUStore(unittest.TestCase):
+    def test_entries_measure_counts_entries(self):
+        store = SQLiteLRUStore(":memory:", "entries", 10)
+        for i in range(11):
+            store.put(str(i), b"x" * 100)
+
+        # Trimmed to 90% of the capacity, oldest first
+        self.assertEqual(store.stats()["entries"], 9)
+        self.assertIsNone(store.get("0"))
+        self.assertEqual(store.get("10"), b"x" * 100)
+
+    def test_bytes_measure_counts_stored_bytes(self):
+        store = SQLiteLRUStore(":memory:", "blobs", 1000, measure="bytes")
+        store.put("a", b"a" * 400)
+        store.put("b", b"b" * 400)
+        store.get("a")
+        store.put("c", b"c" * 400)
+
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a"), b"a" * 400)
+        self.assertLessEqual(store.stats()["bytes"], 1000)
+
+        store.put("huge", b"h" * 1001)
+        self.assertIsNone(store.get("huge"))
+
+    def test_replaced_tables_are_dropped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite3")
+            with sqlite3.connect(path) as conn:
+                conn.execute("CREATE TABLE old_layout (key TEXT)")
+            store = SQLiteLRUStore(path, "new_layout", 10, replaces=("old_layout",))
+            store.put("k", b"v")
+
+            tables = {name for (name,) in store._connect().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self.assertEqual(tables, {"new_layout"})
+
+    def test_rejects_unknown_measure(self):
+        with self.assertRaises(ValueError):
+            SQLiteLRUStore(":memory:", "t", 10, measure="rows")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,24 +1,45 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import student_dashboard as sd
+from utils import repository
+
+
+class SessionState(dict):
+    # Streamlit's session_state supports both item and attribute access
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+@pytest.fixture(autouse=True)
+def clear_repository_cache():
+    repository.clear_cache()
+    yield
+    repository.clear_cache()
+
 
 @patch("student_dashboard.st")
 def test_show_student_dashboard_quiz_display(mock_st):
     # Setup session state
-    mock_st.session_state = {
+    mock_st.session_state = SessionState({
         "logged_in": True,
         "role": "Student",
         "uid": "student_123"
-    }
+    })
 
-    # Mock Firestore client
+    # Mock Firestore client; reads run concurrently, so each collection gets its own mock
+    collections = {
+        name: MagicMock(name=name)
+        for name in ("users", "quizzes", "student_results", "teacher_requests")
+    }
     mock_firestore_client = MagicMock()
+    mock_firestore_client.collection.side_effect = lambda name: collections[name]
 
     # Mock student document
     student_data = {"teacher_id": "teacher_abc"}
     student_doc = MagicMock()
+    student_doc.exists = True
     student_doc.to_dict.return_value = student_data
-    mock_firestore_client.collection.return_value.document.return_value.get.return_value = student_doc
+    collections["users"].document.return_value.get.return_value = student_doc
 
     # Mock quiz document
     quiz_doc = MagicMock()
@@ -27,20 +48,21 @@ def test_show_student_dashboard_quiz_display(mock_st):
         "teacher_id": "teacher_abc",
         "start_time": "2025-05-25T00:00:00+00:00",
         "end_time": "2099-05-25T23:59:59+00:00",
-        "questions": [
-            {
-                "question": "2 + 2?",
-                "options": ["3", "4", "5"],
-                "answer": "4"
-            }
-        ]
     }
     quiz_doc.id = "quiz123"
     quiz_doc.to_dict.return_value = quiz_data
-    mock_firestore_client.collection.return_value.where.return_value.stream.side_effect = [
-        [quiz_doc],  # quizzes
-        []           # student_results
-    ]
+    quiz_query = collections["quizzes"].where.return_value.where.return_value
+    quiz_query.select.return_value.stream.return_value = [quiz_doc]
+
+    # Mock teacher list
+    teacher_doc = MagicMock()
+    teacher_doc.id = "teacher_abc"
+    teacher_doc.to_dict.return_value = {"name": "Ms. Abc", "role": "Teacher"}
+    collections["users"].where.return_value.stream.return_value = [teacher_doc]
+
+    # No past results, no pending requests
+    collections["student_results"].where.return_value.stream.return_value = []
+    collections["teacher_requests"].where.return_value.where.return_value.stream.return_value = []
 
     # Mock form submission handling
     mock_st.form = MagicMock()
@@ -57,6 +79,7 @@ def test_show_student_dashboard_quiz_display(mock_st):
     mock_st.button = MagicMock(return_value=False)
     mock_st.info = MagicMock()
     mock_st.warning = MagicMock()
+    mock_st.selectbox = MagicMock(return_value="Ms. Abc ✅ Registered")
     mock_st.experimental_rerun = MagicMock()
 
     # Run dashboard logic
@@ -64,3 +87,13 @@ def test_show_student_dashboard_quiz_display(mock_st):
 
     # Assert the dashboard header was shown
     mock_st.header.assert_called_with("🎓 Student Dashboard")
+    mock_st.subheader.assert_any_call("Quiz: Math Quiz")
+
+    # student_results is queried once per render
+    collections["student_results"].where.return_value.stream.assert_called_once()
+
+    # Quizzes are filtered on end_time server-side and listed without their questions
+    end_filter = collections["quizzes"].where.return_value.where.call_args
+    assert end_filter.args[:2] == ("end_time", ">=")
+    assert "questions" not in quiz_query.select.call_args[0][0]
+    collections["users"].document.return_value.get.assert_called_once_with()
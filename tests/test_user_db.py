@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import MagicMock
+
+from utils import user_db
+
+
+def _snapshot(doc_id, data, exists=True):
+    doc = MagicMock()
+    doc.id = doc_id
+    doc.exists = exists
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestUserDB(unittest.TestCase):
+    def test_get_users_by_ids_dedupes_and_skips_missing(self):
+        mock_db = MagicMock()
+        mock_db.get_all.return_value = [
+            _snapshot("s1", {"name": "Ann"}),
+            _snapshot("s2", None, exists=False),
+        ]
+
+        users = user_db.get_users_by_ids(mock_db, ["s1", "s2", "s1", None])
+
+        self.assertEqual(users, {"s1": {"name": "Ann"}})
+        mock_db.get_all.assert_called_once()
+        self.assertEqual(len(mock_db.get_all.call_args[0][0]), 2)
+
+    def test_get_users_by_ids_chunks_requests(self):
+        mock_db = MagicMock()
+        mock_db.get_all.return_value = []
+
+        user_db.get_users_by_ids(mock_db, [f"s{i}" for i in range(5)], chunk_size=2)
+
+        self.assertEqual(mock_db.get_all.call_count, 3)
+
+    def test_get_users_by_ids_empty(self):
+        mock_db = MagicMock()
+        self.assertEqual(user_db.get_users_by_ids(mock_db, []), {})
+        mock_db.get_all.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
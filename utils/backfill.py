@@ -0,0 +1,66 @@
+from utils.batch_writer import MAX_BATCH_SIZE, bulk_write, update_op
+from utils.quiz_db import to_utc_datetime
+from utils.user_db import get_users_by_ids, student_snapshot
+
+# Collections that carry a student name/email snapshot next to student_id
+SNAPSHOT_COLLECTIONS = ("student_results", "teacher_requests")
+
+
+def _print_progress(label):
+    return lambda done, total: print(f"[Backfill] {label}: {done}/{total}")
+
+
+def backfill_student_snapshots(db, batch_size=MAX_BATCH_SIZE, collections=SNAPSHOT_COLLECTIONS):
+    # Copy student name/email onto documents written before the snapshot existed.
+    # Returns {collection: number_of_documents_updated}.
+    updated = {}
+
+    for collection in collections:
+        missing = []
+        for doc in db.collection(collection).stream():
+            data = doc.to_dict()
+            if not data.get("student_name"):
+                missing.append((doc.reference, data.get("student_id")))
+        students = get_users_by_ids(db, [student_id for _, student_id in missing])
+
+        updated[collection] = bulk_write(
+            db,
+            [
+                update_op(ref, student_snapshot(students[student_id]))
+                for ref, student_id in missing
+                if student_id in students
+            ],
+            batch_size=batch_size,
+            progress=_print_progress(collection),
+        )
+
+    return updated
+
+
+def normalize_quiz_times(db, batch_size=MAX_BATCH_SIZE):
+    # Rewrite ISO-string start_time/end_time values as Timestamps so the
+    # server-side end_time range query can see older quizzes.
+    # Returns the number of quizzes updated.
+    operations = []
+    for doc in db.collection("quizzes").stream():
+        data = doc.to_dict()
+        changes = {}
+        for field in ("start_time", "end_time"):
+            value = data.get(field)
+            if isinstance(value, str):
+                try:
+                    changes[field] = to_utc_datetime(value)
+                except ValueError:
+                    print(f"[Backfill] quizzes/{doc.id}: unparseable {field} {value!r}")
+        if changes:
+            operations.append(update_op(doc.reference, changes))
+
+    return bulk_write(db, operations, batch_size=batch_size, progress=_print_progress("quizzes"))
+
+
+if __name__ == "__main__":
+    from firebaseConfig import db
+
+    for name, count in backfill_student_snapshots(db).items():
+        print(f"[Backfill] {name}: {count} documents updated")
+    print(f"[Backfill] quizzes: {normalize_quiz_times(db)} quiz time fields normalized")
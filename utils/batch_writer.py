@@ -0,0 +1,62 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Firestore rejects write batches with more than 500 operations
+MAX_BATCH_SIZE = 500
+MAX_CONCURRENT_COMMITS = 4
+
+
+def delete_op(ref):
+    return ("delete", ref)
+
+
+def update_op(ref, data):
+    return ("update", ref, data)
+
+
+def set_op(ref, data):
+    return ("set", ref, data)
+
+
+def _commit(db, operations):
+    batch = db.batch()
+    for op in operations:
+        kind, ref = op[0], op[1]
+        if kind == "delete":
+            batch.delete(ref)
+        elif kind == "update":
+            batch.update(ref, op[2])
+        elif kind == "set":
+            batch.set(ref, op[2])
+        else:
+            raise ValueError(f"Unknown write operation: {kind}")
+    batch.commit()
+    return len(operations)
+
+
+def bulk_write(db, operations, batch_size=MAX_BATCH_SIZE, max_workers=MAX_CONCURRENT_COMMITS, progress=None):
+    # Group delete/update/set operations into write batches and commit them
+    # concurrently. `progress(done, total)` is called from the calling thread
+    # after each batch lands. Returns the number of operations written.
+    operations = list(operations)
+    total = len(operations)
+    if not total:
+        return 0
+
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    chunks = [operations[i:i + batch_size] for i in range(0, total, batch_size)]
+
+    if len(chunks) == 1:
+        done = _commit(db, chunks[0])
+        if progress:
+            progress(done, total)
+        return done
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _commit, db, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            done += future.result()
+            if progress:
+                progress(done, total)
+    return done
@@ -0,0 +1,91 @@
+import re
+
+from utils.chunker import count_tokens
+
+# A header/footer line must repeat on at least this many pages to be dropped
+BOILERPLATE_MIN_PAGES = 3
+# Lines anywhere on the page are dropped once they repeat on this share of pages
+BODY_REPEAT_FRACTION = 0.5
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+# A well-formed roman numeral ("xiv", "MMXX"), not just any run of those
+# letters ("mild", "civil", "dim"); the lookahead rules out an empty match
+_ROMAN = r"(?=[ivxlcdm])m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})"
+# "12", "Page 12", "12 of 300", "- 12 -", "xiv"
+_PAGE_NUMBER_RE = re.compile(rf"^[-–—\s]*(?:page\s*)?(?:\d+(?:\s*(?:of|/)\s*\d+)?|{_ROMAN})[-–—\s]*$", re.IGNORECASE)
+# "Introduction ........ 12" (dot leaders before a page number)
+_TOC_LINE_RE = re.compile(rf"^.{{2,}}?(?:\.\s?){{3,}}\s*(?:\d+|{_ROMAN})\s*$", re.IGNORECASE)
+_ENDS_WITH_NUMBER_RE = re.compile(rf"\s(?:\d+|{_ROMAN})\s*$", re.IGNORECASE)
+_CONTENTS_RE = re.compile(r"^\s*(?:table of )?contents\s*$", re.IGNORECASE)
+
+
+def _normalize(line):
+    # Page numbers inside running headers ("Chapter 3 | 41") vary per page
+    return _SPACE_RE.sub(" ", _DIGITS_RE.sub("#", line.lower())).strip()
+
+
+def _count_page(counts, key, number):
+    # counts[key] = [pages seen on, last page seen on]
+    entry = counts.setdefault(key, [0, -1])
+    if entry[1] != number:
+        entry[0] += 1
+        entry[1] = number
+
+
+def _is_toc_page(lines):
+    texts = [text for _, text in lines]
+    if sum(1 for t in texts if _TOC_LINE_RE.match(t)) >= 5:
+        return True
+    if any(_CONTENTS_RE.match(t) for t in texts):
+        numbered = sum(1 for t in texts if _ENDS_WITH_NUMBER_RE.search(t))
+        return numbered >= max(3, len(texts) // 2)
+    return False
+
+
+def strip_boilerplate(pages, model="gpt-3.5-turbo"):
+    # pages: one [(zone, line)] list per page, zone being "top", "bottom" or
+    # "body". Drops running headers/footers (margin lines repeated across
+    # pages, page numbers ignored), lines repeated on most pages, lone page
+    # numbers in the margins and table-of-contents pages. Returns
+    # (page texts, report) where report counts what was removed.
+    pages = [list(page) for page in pages]
+
+    # One pass over every line to count the pages it is on: margin lines with
+    # page numbers masked out, any line by its exact text
+    margin_pages, exact_pages = {}, {}
+    for number, lines in enumerate(pages):
+        for zone, text in lines:
+            if zone != "body":
+                _count_page(margin_pages, _normalize(text), number)
+            _count_page(exact_pages, text.strip(), number)
+    body_repeats = max(BOILERPLATE_MIN_PAGES, int(len(pages) * BODY_REPEAT_FRACTION))
+
+    texts, removed = [], []
+    for lines in pages:
+        if _is_toc_page(lines):
+            removed.extend(text for _, text in lines)
+            texts.append("")
+            continue
+        kept = []
+        for zone, text in lines:
+            in_margin = zone != "body"
+            if (
+                (in_margin and margin_pages[_normalize(text)][0] >= BOILERPLATE_MIN_PAGES)
+                or exact_pages[text.strip()][0] >= body_repeats
+                or (in_margin and _PAGE_NUMBER_RE.match(text))
+                or _TOC_LINE_RE.match(text)
+            ):
+                removed.append(text)
+            else:
+                kept.append(text)
+        texts.append("".join(f"{text}\n" for text in kept))
+
+    removed_text = "\n".join(removed)
+    report = {
+        "pages": len(pages),
+        "lines_removed": len(removed),
+        "chars_removed": sum(len(text) + 1 for text in removed),
+        "tokens_saved": count_tokens(removed_text, model) if removed else 0,
+    }
+    return texts, report
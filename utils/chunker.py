@@ -0,0 +1,148 @@
+import math
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional: exact token counts when installed
+    tiktoken = None
+
+# Roughly the old 500-character chunks, expressed in tokens
+MCQ_CHUNK_TOKENS = int(os.getenv("MCQ_CHUNK_TOKENS", "125"))
+
+# Sentences shorter than this are headings, page numbers or extraction noise
+MIN_SENTENCE_CHARS = 20
+
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by
+# whitespace and something that can start a new sentence, or by a line break
+# (lists and lowercase-started lines). A line starting with a bullet starts a
+# new sentence even without a terminator before it.
+_BOUNDARY_RE = re.compile(
+    r"""[.!?]+["')\]]*(?:\s+(?=["'(\[]?[A-Z0-9])|[^\S\n]*\n\s*)"""
+    r"""|[^\S\n]*\n\s*(?=[•◦▪‣·*–—-]\s)"""
+)
+_TERMINATORS = ".!?"
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]{2,}")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "fig", "figs", "eq",
+    "no", "vol", "pp", "ch", "sec", "approx", "dept", "inc", "ltd", "co", "e.g", "i.e",
+    "al", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "had", "her", "was",
+    "one", "our", "out", "has", "his", "how", "its", "may", "new", "now", "see", "two", "who",
+    "did", "get", "him", "let", "say", "she", "too", "use", "that", "with", "have", "this",
+    "will", "your", "from", "they", "been", "were", "what", "when", "which", "their", "there",
+    "these", "those", "then", "than", "them", "into", "also", "such", "more", "most", "some",
+    "only", "other", "each", "very", "over", "both", "about", "would", "could", "should",
+}
+
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    if tiktoken is not None:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _encodings[model] = encoding
+        return len(encoding.encode(text))
+    # BPE vocabularies average ~4 characters per token on English prose;
+    # long unbroken strings count by length, punctuation-heavy text by pieces.
+    return max(len(_TOKEN_RE.findall(text)), math.ceil(len(text) / 4))
+
+
+def iter_sentences(text):
+    # Single left-to-right pass over the text; yields whitespace-normalized sentences
+    start = 0
+    for match in _BOUNDARY_RE.finditer(text):
+        if text[match.start()] in _TERMINATORS:
+            # Walk back over the word before the boundary (O(word length))
+            word_start = match.start()
+            while word_start > start and not text[word_start - 1].isspace():
+                word_start -= 1
+            word = text[word_start:match.start()].lower().rstrip(".")
+            # Skip abbreviations and initials ("Dr. Smith", "J. Watson", "e.g. Rome")
+            if word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        sentence = " ".join(text[start:match.end()].split())
+        if sentence:
+            yield sentence
+        start = match.end()
+    tail = " ".join(text[start:].split())
+    if tail:
+        yield tail
+
+
+def split_long_sentence(sentence, max_tokens=MCQ_CHUNK_TOKENS, model="gpt-3.5-turbo"):
+    # Pieces of at most max_tokens, cut at word boundaries. A single word over
+    # the budget is cut every max_tokens characters (a token is at least one).
+    piece, piece_tokens = [], 0
+    for word in sentence.split():
+        if len(word) > max_tokens and count_tokens(word, model) > max_tokens:
+            if piece:
+                yield " ".join(piece)
+                piece, piece_tokens = [], 0
+            yield from (word[i:i + max_tokens] for i in range(0, len(word), max_tokens))
+            continue
+        tokens = count_tokens(f" {word}", model)
+        if piece and piece_tokens + tokens > max_tokens:
+            yield " ".join(piece)
+            piece, piece_tokens = [], 0
+        piece.append(word)
+        piece_tokens += tokens
+    if piece:
+        yield " ".join(piece)
+
+
+def chunk_text(text, max_tokens=MCQ_CHUNK_TOKENS, model="gpt-3.5-turbo"):
+    # Packs whole sentences into chunks of at most max_tokens; a longer
+    # sentence is cut at word boundaries first. Each chunk is joined once.
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in iter_sentences(text):
+        if len(sentence) <= MIN_SENTENCE_CHARS:
+            continue
+        tokens = count_tokens(sentence, model)
+        pieces = [(sentence, tokens)] if tokens <= max_tokens else [
+            (piece, count_tokens(piece, model)) for piece in split_long_sentence(sentence, max_tokens, model)
+        ]
+        for piece, tokens in pieces:
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def information_density(chunk):
+    # Distinct content words per token: favors definitions and facts over filler
+    words = {w.lower() for w in _WORD_RE.findall(chunk)} - STOPWORDS
+    return len(words) / max(count_tokens(chunk), 1)
+
+
+def select_chunks(chunks, count):
+    # Split the document into `count` equal spans and take the densest chunk
+    # from each, so questions cover the whole text. Keeps document order.
+    if count <= 0:
+        return []
+    if len(chunks) <= count:
+        return list(chunks)
+    selected = []
+    for i in range(count):
+        lo = i * len(chunks) // count
+        hi = (i + 1) * len(chunks) // count
+        best = max(range(lo, hi), key=lambda j: information_density(chunks[j]))
+        selected.append(chunks[best])
+    return selected
@@ -0,0 +1,291 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from itertools import chain, islice
+
+import numpy as np
+
+from utils.chunker import STOPWORDS, chunk_text, iter_sentences
+from utils.dedup import NearDuplicateIndex
+from utils.embedding_index import MCQ_EMBEDDING_DIMS, EmbeddingIndex, truncated_svd
+
+# Candidate answers: words of 4+ letters (hyphens allowed) and numbers
+_TERM_RE = re.compile(r"\b(?:[A-Za-z][A-Za-z-]{3,}|\d+(?:\.\d+)?)\b")
+BLANK = "_____"
+
+# Cloze questions tried per chunk before moving on when they are near-duplicates
+CLOZE_TRIES_PER_CHUNK = 4
+
+# Documents whose term model (and embedding index) stay in memory
+MCQ_MODEL_CACHE_SIZE = int(os.getenv("MCQ_MODEL_CACHE_SIZE", "8"))
+
+_SUFFIX_TYPES = (
+    ("noun", ("tion", "sion", "ment", "ness", "ity", "ism", "ance", "ence", "ship", "ogy", "ist")),
+    ("adjective", ("ous", "ive", "ful", "less", "able", "ible", "ical", "ic", "al")),
+    ("verb", ("ing", "ed", "ize", "ise", "ate")),
+    ("adverb", ("ly",)),
+)
+
+
+def term_type(term):
+    # Cheap part-of-speech proxy so distractors look like plausible answers
+    if " " in term.strip():
+        return "phrase"
+    if term[0].isdigit():
+        return "number"
+    if term[0].isupper():
+        return "proper"
+    lowered = term.lower()
+    for name, suffixes in _SUFFIX_TYPES:
+        if lowered.endswith(suffixes):
+            return name
+    return "word"
+
+
+class TermModel:
+    # TF-IDF over the chunks of one document, computed with NumPy. Only the
+    # non-zero (chunk, term) entries are stored, sorted by chunk.
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        surface_counts = {}
+        phrase_counts = {}
+        rows, cols = [], []
+        index = {}
+        for row, chunk in enumerate(self.chunks):
+            previous = None
+            for match in _TERM_RE.finditer(chunk):
+                surface = match.group(0)
+                key = surface.lower()
+                if key in STOPWORDS:
+                    previous = None
+                    continue
+                col = index.setdefault(key, len(index))
+                rows.append(row)
+                cols.append(col)
+                surface_counts.setdefault(key, {}).setdefault(surface, 0)
+                surface_counts[key][surface] += 1
+                # Two adjacent terms ("carbon dioxide") are a candidate phrase
+                if previous is not None and chunk[previous.end():match.start()] == " " and not surface[0].isdigit():
+                    phrase = f"{previous.group(0)} {surface}"
+                    phrase_counts.setdefault(phrase.lower(), {}).setdefault(phrase, 0)
+                    phrase_counts[phrase.lower()][phrase] += 1
+                previous = None if surface[0].isdigit() else match
+
+        self.terms = [None] * len(index)
+        for key, col in index.items():
+            forms = surface_counts[key]
+            self.terms[col] = max(forms, key=forms.get)
+        self.index = index
+        self.index_of_chunk = {chunk: row for row, chunk in enumerate(self.chunks)}
+        self.types = [term_type(t) for t in self.terms]
+        # Phrases seen at least twice get an embedding next to the single terms
+        self.phrases = [
+            max(forms, key=forms.get) for forms in phrase_counts.values() if sum(forms.values()) >= 2
+        ]
+
+        n_terms = len(self.terms)
+        keys, counts = np.unique(np.array(rows, dtype=np.int64) * n_terms + np.array(cols, dtype=np.int64),
+                                 return_counts=True)
+        self._rows = keys // max(n_terms, 1)
+        self._cols = keys % max(n_terms, 1)
+        totals = np.bincount(self._rows, weights=counts, minlength=len(self.chunks))
+        df = np.bincount(self._cols, minlength=n_terms)
+        idf = np.log((1.0 + len(self.chunks)) / (1.0 + df)) + 1.0
+        self._values = (counts / np.maximum(totals[self._rows], 1.0) * idf[self._cols]).astype(np.float32)
+        self._row_starts = np.searchsorted(self._rows, np.arange(len(self.chunks) + 1))
+
+        # Document-level importance of each term, used to rank distractors
+        self.term_scores = np.zeros(n_terms, dtype=np.float32)
+        np.maximum.at(self.term_scores, self._cols, self._values)
+        self._ranked = np.argsort(-self.term_scores, kind="stable")
+        self._embeddings = None
+
+    @property
+    def embeddings(self):
+        # Terms embedded by their co-occurrence across chunks (truncated SVD of
+        # the term x chunk TF-IDF matrix); phrases are the mean of their words.
+        # Built on first use, then every lookup is a single matrix product.
+        if self._embeddings is None:
+            term_vectors = truncated_svd(
+                self._cols, self._rows, self._values, (len(self.terms), len(self.chunks)), MCQ_EMBEDDING_DIMS
+            )
+            index = EmbeddingIndex(self.terms, term_vectors)
+            phrase_vectors = [index.vector(phrase) for phrase in self.phrases]
+            self._embeddings = EmbeddingIndex(
+                self.terms + self.phrases,
+                np.vstack([index.vectors] + [v[None] for v in phrase_vectors]) if self.phrases else index.vectors,
+            )
+        return self._embeddings
+
+    def row_scores(self, row):
+        # (term columns, TF-IDF scores) of one chunk
+        start, end = self._row_starts[row], self._row_starts[row + 1]
+        return self._cols[start:end], self._values[start:end]
+
+    def distractors(self, answer, count=3, exclude=()):
+        # The answer's nearest neighbours in the document's embedding space
+        # first, then the highest-scoring other terms; terms of the answer's
+        # type before any other. Years and quantities skip the embeddings.
+        answer_type = term_type(answer)
+        excluded = {answer.lower(), *(e.lower() for e in exclude)}
+        answer_words = set(answer.lower().split())
+        neighbours = () if answer_type == "number" else (
+            label for label, _ in self.embeddings.nearest(answer, k=count * 4)
+        )
+        ranked = (self.terms[col] for col in self._ranked)
+        same_type, other_type = [], []
+        for term in chain(neighbours, ranked):
+            key = term.lower()
+            # "carbon dioxide" is no distractor for "carbon"
+            if key in excluded or answer_words.intersection(key.split()):
+                continue
+            excluded.add(key)
+            bucket = same_type if term_type(term) == answer_type else other_type
+            if len(bucket) < count:
+                bucket.append(term)
+            if len(same_type) == count:
+                break
+        if answer_type == "number":
+            # A year or quantity needs numeric options; make up nearby ones if the text has too few
+            same_type += _nearby_numbers(answer, count - len(same_type), excluded)
+        return (same_type + other_type)[:count]
+
+    def options_for(self, answer, keep=()):
+        # Four options around an answer: the distractors in `keep`, topped up
+        # with distractors() when some are missing or duplicated
+        kept = {}
+        for option in keep:
+            if isinstance(option, str) and option.strip() and option.lower() != answer.lower():
+                kept.setdefault(option.lower(), option)
+        distractors = list(kept.values())[:3]
+        distractors += self.distractors(answer, count=3 - len(distractors), exclude=distractors)
+        return _place_answer(answer, distractors)
+
+    def cloze_for_chunk(self, chunk):
+        row = self.index_of_chunk.get(chunk)
+        return self.cloze_question(row) if row is not None else None
+
+    def cloze_question(self, row):
+        return next(self.cloze_questions(row), None)
+
+    def cloze_questions(self, row):
+        # Cloze questions of one chunk, best first: the highest-scoring term
+        # first, and at most one question per sentence (blanking another term
+        # of the same sentence would give a near-duplicate)
+        chunk = self.chunks[row]
+        sentences = [s for s in iter_sentences(chunk) if len(s.split()) >= 6]
+        cols, scores = self.row_scores(row)
+        for col in cols[np.argsort(-scores, kind="stable")]:
+            if not sentences:
+                return
+            answer = self.terms[col]
+            pattern = re.compile(rf"\b{re.escape(answer)}\b", re.IGNORECASE)
+            for sentence in sentences:
+                match = pattern.search(sentence)
+                if match is None:
+                    continue
+                distractors = self.distractors(answer, exclude=_TERM_RE.findall(sentence))
+                if len(distractors) < 3:
+                    continue
+                sentences.remove(sentence)
+                # Every occurrence is blanked so the sentence doesn't give the answer away
+                question = pattern.sub(BLANK, sentence)
+                yield {
+                    "question": f"Fill in the blank: {question}",
+                    "options": _place_answer(match.group(0), distractors),
+                    "answer": match.group(0),
+                }
+                break
+
+
+def _nearby_numbers(answer, count, excluded):
+    if count <= 0:
+        return []
+    decimals = len(answer.split(".")[1]) if "." in answer else 0
+    value = float(answer)
+    step = 10 ** -decimals if decimals else (10 if value >= 100 else 1)
+    numbers = []
+    for offset in (1, -1, 2, -2, 3, -3, 5, -5):
+        candidate = f"{value + offset * step:.{decimals}f}"
+        if candidate not in excluded and not candidate.startswith("-"):
+            numbers.append(candidate)
+        if len(numbers) == count:
+            break
+    return numbers
+
+
+def _place_answer(answer, distractors):
+    # Deterministic position so the same chunk always gives the same question
+    options = list(distractors)
+    options.insert(zlib.crc32(answer.encode("utf-8")) % (len(options) + 1), answer)
+    return options
+
+
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def content_hash(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def document_model(chunks):
+    # One TermModel per document content, so the TF-IDF and embedding index
+    # are built once and reused by every later quiz from the same PDF
+    key = content_hash(chunks)
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+    model = TermModel(chunks)
+    with _models_lock:
+        model = _models.setdefault(key, model)
+        _models.move_to_end(key)
+        while len(_models) > MCQ_MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+    return model
+
+
+def clear_models():
+    with _models_lock:
+        _models.clear()
+
+
+def generate_cloze_mcqs(text, num_questions=3, existing=None):
+    # Rule-based MCQs with no model call: the highest TF-IDF term of a sentence
+    # is blanked out and other high-scoring terms of the same type are the options.
+    # Near-duplicates of an earlier question or of the teacher's bank
+    # (`existing`, a NearDuplicateIndex or None) are skipped, e.g. for a
+    # sentence the document repeats.
+    chunks = chunk_text(text)
+    if not chunks or num_questions <= 0:
+        return []
+    model = document_model(chunks)
+
+    # Evenly spaced chunks first so questions cover the whole document,
+    # then the rest in order to fill any slots that produced no question
+    spread = list(dict.fromkeys(i * len(chunks) // num_questions for i in range(num_questions)))
+    taken = set(spread)
+    candidates = spread + [row for row in range(len(chunks)) if row not in taken]
+
+    mcqs = {}
+    generated = NearDuplicateIndex()
+    for row in candidates:
+        if len(mcqs) == num_questions:
+            break
+        for mcq in islice(model.cloze_questions(row), CLOZE_TRIES_PER_CHUNK):
+            text = mcq["question"]
+            if not generated.query(text) and (existing is None or not existing.query(text)):
+                generated.add(row, text)
+                mcqs[row] = mcq
+                break
+    return [mcqs[row] for row in sorted(mcqs)]
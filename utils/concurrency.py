@@ -0,0 +1,29 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded, process-wide pool for independent Firestore reads. Tasks must not
+# submit further work to this pool and wait on it, or they can starve it.
+MAX_FANOUT_WORKERS = int(os.getenv("QUIZ_RUNNER_FANOUT_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_FANOUT_WORKERS, thread_name_prefix="quiz-runner-fanout")
+
+
+def fetch_concurrently(tasks, return_exceptions=False):
+    # Run independent zero-argument callables concurrently and join them.
+    # `tasks` is {name: callable}; returns {name: result}. With
+    # return_exceptions=True a failing task yields its exception instead of
+    # raising, so callers can report each failure separately.
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, task)
+        for name, task in tasks.items()
+    }
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results[name] = e
+    return results
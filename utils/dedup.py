@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Estimated Jaccard similarity (over word pairs) at which two questions count as duplicates
+MCQ_DEDUP_THRESHOLD = float(os.getenv("MCQ_DEDUP_THRESHOLD", "0.6"))
+
+NUM_PERM = 64
+# Teachers whose question bank index stays in memory
+MCQ_BANK_CACHE_SIZE = int(os.getenv("MCQ_BANK_CACHE_SIZE", "64"))
+
+BANDS = 16  # 16 bands of 4 rows: pairs above ~0.5 similarity almost always share a bucket
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.int64)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CLOZE_PREFIX = "fill in the blank:"
+
+
+def question_text(mcq):
+    # What two MCQs are compared on: the question itself, not its options
+    if isinstance(mcq, dict):
+        mcq = mcq.get("question")
+    return mcq if isinstance(mcq, str) else ""
+
+
+def shingles(text):
+    # Adjacent word pairs of the normalized question; single words for one-word questions
+    text = text.lower()
+    if text.startswith(_CLOZE_PREFIX):
+        text = text[len(_CLOZE_PREFIX):]
+    words = _WORD_RE.findall(text)
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(text, num_perm=NUM_PERM):
+    # num_perm universal hashes of every shingle at once; the signature is the column-wise minimum
+    items = shingles(text)
+    if not items:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) & _PRIME for s in items), dtype=np.int64, count=len(items))
+    return ((np.outer(hashes, _A[:num_perm]) + _B[:num_perm]) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    # MinHash signatures bucketed by LSH bands: a query only compares against
+    # items sharing a band, so lookups stay flat as the bank grows.
+
+    def __init__(self, threshold=MCQ_DEDUP_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows = num_perm // bands
+        self.bands = bands
+        self._signatures = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, key, text):
+        signature = minhash(text, self.num_perm)
+        if signature is None:
+            return
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def query(self, text):
+        # Keys of indexed items estimated at least `threshold` similar to text
+        signature = minhash(text, self.num_perm)
+        if signature is None:
+            return []
+        candidates = {key for band_key in self._band_keys(signature) for key in self._buckets.get(band_key, ())}
+        return [
+            key for key in candidates
+            if np.count_nonzero(self._signatures[key] == signature) >= self.threshold * self.num_perm
+        ]
+
+
+_banks = OrderedDict()
+_banks_lock = threading.Lock()
+
+
+def bank_index(teacher_id, quiz_ids, load_questions):
+    # One index per teacher over the questions of all their quizzes. Only
+    # quizzes not indexed yet are passed to load_questions(quiz_ids), which
+    # returns {quiz_id: questions}, so a bank seen before costs no reads. The
+    # index is only rebuilt when a quiz has been deleted.
+    quiz_ids = set(quiz_ids)
+    with _banks_lock:
+        indexed, index = _banks.get(teacher_id, (None, None))
+        if indexed is None or not indexed <= quiz_ids:
+            indexed, index = set(), NearDuplicateIndex()
+            _banks[teacher_id] = (indexed, index)
+        _banks.move_to_end(teacher_id)
+        while len(_banks) > MCQ_BANK_CACHE_SIZE:
+            _banks.popitem(last=False)
+        missing = sorted(quiz_ids - indexed)
+    # Loaded outside the lock so other teachers aren't kept waiting on the reads
+    loaded = load_questions(missing) if missing else {}
+    with _banks_lock:
+        for quiz_id, questions in loaded.items():
+            if quiz_id in indexed:
+                continue
+            for i, question in enumerate(questions or ()):
+                index.add((quiz_id, i), question_text(question))
+            indexed.add(quiz_id)
+        return index
+
+
+def clear_banks():
+    with _banks_lock:
+        _banks.clear()
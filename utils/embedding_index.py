@@ -0,0 +1,91 @@
+import os
+import re
+
+import numpy as np
+
+# Width of the term vectors built from one document
+MCQ_EMBEDDING_DIMS = int(os.getenv("MCQ_EMBEDDING_DIMS", "64"))
+
+_WORD_RE = re.compile(r"\w[\w.-]*")
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.maximum(norms, 1e-12), dtype=np.float32)
+
+
+def truncated_svd(rows, cols, values, shape, dims, seed=0):
+    # Randomized range finder on a sparse matrix given as (rows, cols, values)
+    # arrays, so the term x chunk matrix of a whole book is never made dense.
+    # Returns the row embeddings U * S of the rank-`dims` approximation.
+    n_rows, n_cols = shape
+    dims = min(dims, n_rows, n_cols)
+    if dims <= 0 or len(values) == 0:
+        return np.zeros((n_rows, max(dims, 0)), dtype=np.float32)
+    rows = np.asarray(rows)
+    cols = np.asarray(cols)
+    values = np.asarray(values, dtype=np.float64)
+
+    width = min(dims + 10, n_cols)
+    omega = np.random.default_rng(seed).standard_normal((n_cols, width))
+    sample = np.empty((n_rows, width))
+    for j in range(width):
+        sample[:, j] = np.bincount(rows, weights=values * omega[cols, j], minlength=n_rows)
+    basis, _ = np.linalg.qr(sample)
+
+    projected = np.empty((basis.shape[1], n_cols))
+    for j in range(basis.shape[1]):
+        projected[j] = np.bincount(cols, weights=values * basis[rows, j], minlength=n_cols)
+    u, s, _ = np.linalg.svd(projected, full_matrices=False)
+    return ((basis @ u[:, :dims]) * s[:dims]).astype(np.float32)
+
+
+class EmbeddingIndex:
+    # Unit-length vectors in one contiguous float32 matrix. A lookup is a
+    # single matrix-vector product followed by argpartition for the top k.
+
+    def __init__(self, labels, vectors):
+        self.labels = list(labels)
+        self.vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(self.labels), -1))
+        self._rows = {}
+        for row, label in enumerate(self.labels):
+            self._rows.setdefault(label.lower(), row)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def vector(self, text):
+        # Known labels map to their own row; anything else (e.g. an answer
+        # phrase written by the LLM) is the mean of the words it contains
+        row = self._rows.get(text.lower())
+        if row is not None:
+            return self.vectors[row]
+        rows = [self._rows[w] for w in (w.lower() for w in _WORD_RE.findall(text)) if w in self._rows]
+        if not rows:
+            return None
+        return _normalize(self.vectors[rows].mean(axis=0))
+
+    def nearest(self, query, k=5, exclude=()):
+        # [(label, cosine)] of the k closest labels, best first
+        vector = self.vector(query) if isinstance(query, str) else query
+        if vector is None or k <= 0 or not self.labels:
+            return []
+        skip = {e.lower() for e in exclude}
+        if isinstance(query, str):
+            skip.add(query.lower())
+
+        scores = self.vectors @ vector
+        take = min(len(scores), k + len(skip))
+        top = np.argpartition(-scores, take - 1)[:take]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        for row in top:
+            label = self.labels[row]
+            if label.lower() in skip:
+                continue
+            results.append((label, float(scores[row])))
+            if len(results) == k:
+                break
+        return results
@@ -0,0 +1,236 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+from contextlib import contextmanager
+
+# Opt-in: counting wraps every Firestore call, so it stays off unless asked for
+ENABLED = os.getenv("QUIZ_RUNNER_FIRESTORE_DEBUG", "").lower() in ("1", "true", "yes", "on")
+
+logger = logging.getLogger("quiz_runner.firestore")
+
+_current_ledger = contextvars.ContextVar("firestore_ledger", default=None)
+
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+_STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+# Data-layer modules; a call is attributed to whoever called into them
+_DATA_LAYER_FILES = {
+    os.path.join(_UTILS_DIR, name)
+    for name in ("firestore_metrics.py", "repository.py", "batch_writer.py", "user_db.py", "concurrency.py")
+}
+
+# Methods that return another reference/query to keep instrumenting
+_CHAINABLE = {
+    "collection", "document", "where", "select", "limit", "limit_to_last", "order_by",
+    "offset", "start_at", "start_after", "end_at", "end_before",
+}
+
+
+class Ledger:
+    # Firestore usage recorded during one Streamlit rerun, grouped by call site
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sites = {}
+        self._lock = threading.Lock()
+
+    def record(self, site, op, reads=0, writes=0, deletes=0, docs=0, seconds=0.0):
+        with self._lock:
+            entry = self.sites.setdefault((site, op), {
+                "site": site, "op": op, "calls": 0, "reads": 0, "writes": 0,
+                "deletes": 0, "docs": 0, "seconds": 0.0,
+            })
+            entry["calls"] += 1
+            entry["reads"] += reads
+            entry["writes"] += writes
+            entry["deletes"] += deletes
+            entry["docs"] += docs
+            entry["seconds"] += seconds
+
+    def rows(self):
+        with self._lock:
+            return sorted((dict(e) for e in self.sites.values()), key=lambda e: e["seconds"], reverse=True)
+
+    def totals(self):
+        totals = {"calls": 0, "reads": 0, "writes": 0, "deletes": 0, "docs": 0, "seconds": 0.0}
+        for row in self.rows():
+            for key in totals:
+                totals[key] += row[key]
+        totals["render_seconds"] = time.perf_counter() - self.started
+        return totals
+
+    def log(self):
+        for row in self.rows():
+            logger.info(json.dumps({"event": "firestore_call_site", **row}))
+        logger.info(json.dumps({"event": "firestore_render", **self.totals()}))
+
+
+def current_ledger():
+    return _current_ledger.get()
+
+
+@contextmanager
+def render_ledger():
+    # Collect Firestore usage for one rerun; yields None when accounting is disabled
+    if not ENABLED:
+        yield None
+        return
+    ledger = Ledger()
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+        ledger.log()
+
+
+def _call_site():
+    fallback = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename in _DATA_LAYER_FILES:
+            if fallback is None and not filename.endswith("firestore_metrics.py"):
+                fallback = frame
+        elif not filename.startswith(_STDLIB_DIR):
+            break
+        frame = frame.f_back
+    frame = frame or fallback
+    if frame is None:
+        return "unknown"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} ({frame.f_code.co_name})"
+
+
+def _record(op, started, **counts):
+    ledger = _current_ledger.get()
+    if ledger is not None:
+        ledger.record(_call_site(), op, seconds=time.perf_counter() - started, **counts)
+
+
+def _unwrap(value):
+    if isinstance(value, _Instrumented):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+class _Instrumented:
+    # Wraps a client, collection, document or query and counts terminal calls
+
+    def __init__(self, target, label):
+        self._target = target
+        self._label = label
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in _CHAINABLE:
+            def chain(*args, **kwargs):
+                label = self._label
+                if name == "collection" or (name == "document" and self._label is None):
+                    label = str(args[0]).split("/")[0] if args else self._label
+                return _Instrumented(attr(*_unwrap(args), **kwargs), label)
+            return chain
+        handler = getattr(self, f"_op_{name}", None)
+        if handler is not None:
+            return lambda *args, **kwargs: handler(attr, *_unwrap(args), **kwargs)
+        return attr
+
+    def _op_stream(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        docs = 0
+        try:
+            for doc in method(*args, **kwargs):
+                docs += 1
+                yield doc
+        finally:
+            # Queries are billed at least one read even when nothing matches
+            _record(f"{self._label}.stream", started, reads=max(docs, 1), docs=docs)
+
+    def _op_get(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        result = method(*args, **kwargs)
+        if isinstance(result, list):
+            _record(f"{self._label}.get", started, reads=max(len(result), 1), docs=len(result))
+        else:
+            _record(f"{self._label}.get", started, reads=1, docs=1 if getattr(result, "exists", False) else 0)
+        return result
+
+    def _op_get_all(self, method, references, *args, **kwargs):
+        references = list(references)
+        started = time.perf_counter()
+        docs = 0
+        try:
+            for doc in method(references, *args, **kwargs):
+                if doc.exists:
+                    docs += 1
+                yield doc
+        finally:
+            _record("get_all", started, reads=len(references), docs=docs)
+
+    def _write(self, op, method, *args, **kwargs):
+        started = time.perf_counter()
+        result = method(*args, **kwargs)
+        if op == "delete":
+            _record(f"{self._label}.delete", started, deletes=1)
+        else:
+            _record(f"{self._label}.{op}", started, writes=1)
+        return result
+
+    def _op_add(self, method, *args, **kwargs):
+        return self._write("add", method, *args, **kwargs)
+
+    def _op_set(self, method, *args, **kwargs):
+        return self._write("set", method, *args, **kwargs)
+
+    def _op_create(self, method, *args, **kwargs):
+        return self._write("create", method, *args, **kwargs)
+
+    def _op_update(self, method, *args, **kwargs):
+        return self._write("update", method, *args, **kwargs)
+
+    def _op_delete(self, method, *args, **kwargs):
+        return self._write("delete", method, *args, **kwargs)
+
+    def _op_batch(self, method, *args, **kwargs):
+        return _InstrumentedBatch(method(*args, **kwargs))
+
+
+class _InstrumentedBatch:
+    def __init__(self, batch):
+        self._batch = batch
+        self._writes = 0
+        self._deletes = 0
+
+    def set(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._batch.set(_unwrap(reference), *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._batch.create(_unwrap(reference), *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._batch.update(_unwrap(reference), *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        self._deletes += 1
+        return self._batch.delete(_unwrap(reference), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = self._batch.commit(*args, **kwargs)
+        _record("batch.commit", started, writes=self._writes, deletes=self._deletes)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._batch, name)
+
+
+def instrument(client):
+    return _Instrumented(client, None)
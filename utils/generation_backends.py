@@ -0,0 +1,137 @@
+import os
+import random
+import threading
+import time
+
+import openai
+
+# "openai" (default) or "local" (transformers seq2seq model on CPU)
+MCQ_BACKEND = os.getenv("MCQ_BACKEND", "openai")
+OPENAI_MODEL = os.getenv("MCQ_OPENAI_MODEL", "gpt-3.5-turbo")
+LOCAL_MODEL = os.getenv("MCQ_LOCAL_MODEL", "google/flan-t5-base")
+LOCAL_BATCH_SIZE = int(os.getenv("MCQ_LOCAL_BATCH_SIZE", "8"))
+
+# Attempts per API request when it is rate limited or the service is briefly unavailable
+MCQ_API_ATTEMPTS = int(os.getenv("MCQ_API_ATTEMPTS", "5"))
+MAX_BACKOFF_SECONDS = 30.0
+
+TRANSIENT_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIConnectionError,
+    openai.error.Timeout,
+    openai.error.APIError,
+)
+
+
+def retry_delay(error, attempt, base=1.0):
+    # The server's Retry-After when it sends one, otherwise exponential
+    # backoff with jitter so concurrent requests don't retry in lockstep
+    headers = getattr(error, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return min(MAX_BACKOFF_SECONDS, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    delay = min(MAX_BACKOFF_SECONDS, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def with_backoff(call, attempts=MCQ_API_ATTEMPTS, retry_on=TRANSIENT_ERRORS, sleep=None):
+    # Only transient errors are retried; anything else (bad key, invalid request) raises at once
+    for attempt in range(attempts):
+        try:
+            return call()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            (sleep or time.sleep)(retry_delay(e, attempt))
+
+
+class OpenAIBackend:
+    # One chat completion per prompt; callers add concurrency
+    batched_inference = False
+
+    def __init__(self, model=OPENAI_MODEL, temperature=0.7):
+        self.model_name = model
+        self.temperature = temperature
+
+    def complete(self, prompt, max_tokens):
+        response = with_backoff(lambda: openai.ChatCompletion.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=max_tokens
+        ))
+        return response.choices[0].message.content.strip()
+
+    def complete_many(self, prompts, max_tokens):
+        return [self.complete(prompt, max_tokens) for prompt in prompts]
+
+
+_local_models = {}
+_local_models_lock = threading.Lock()
+
+
+def _load_local_model(model_name):
+    # Loaded once per process and shared by every session; transformers/torch
+    # are imported here so the OpenAI path never pays for them.
+    with _local_models_lock:
+        if model_name not in _local_models:
+            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            model.eval()
+            _local_models[model_name] = (tokenizer, model, threading.Lock())
+        return _local_models[model_name]
+
+
+class LocalSeq2SeqBackend:
+    # Runs many prompts through one padded generate() call per batch
+    batched_inference = True
+
+    def __init__(self, model=LOCAL_MODEL, batch_size=LOCAL_BATCH_SIZE, temperature=0.0):
+        self.model_name = model
+        self.batch_size = batch_size
+        self.temperature = temperature
+
+    def complete(self, prompt, max_tokens):
+        return self.complete_many([prompt], max_tokens)[0]
+
+    def complete_many(self, prompts, max_tokens):
+        import torch
+
+        tokenizer, model, lock = _load_local_model(self.model_name)
+        outputs = []
+        for start in range(0, len(prompts), self.batch_size):
+            batch = prompts[start:start + self.batch_size]
+            inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=512)
+            # One generate() at a time per model; torch already uses every core
+            with lock, torch.no_grad():
+                generated = model.generate(
+                    **inputs,
+                    max_new_tokens=max_tokens,
+                    do_sample=self.temperature > 0,
+                    **({"temperature": self.temperature} if self.temperature > 0 else {}),
+                )
+            outputs.extend(text.strip() for text in tokenizer.batch_decode(generated, skip_special_tokens=True))
+        return outputs
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": LocalSeq2SeqBackend,
+}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    name = name or MCQ_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown MCQ backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
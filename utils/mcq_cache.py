@@ -0,0 +1,42 @@
+import hashlib
+import json
+import os
+
+from utils.sqlite_lru import SQLiteLRUStore
+
+# Empty MCQ_CACHE_PATH disables the cache
+MCQ_CACHE_PATH = os.getenv(
+    "MCQ_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "quiz_runner", "mcqs.sqlite3")
+)
+MCQ_CACHE_MAX_ENTRIES = int(os.getenv("MCQ_CACHE_MAX_ENTRIES", "20000"))
+
+
+def cache_key(text_chunk, model, prompt_version, temperature_policy):
+    # Content address of one generation: same chunk + same generation settings
+    payload = json.dumps([text_chunk, model, prompt_version, temperature_policy], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MCQCache:
+    # Persistent SQLite store of generated MCQs, evicted least-recently-used
+    # first once there are more than max_entries
+
+    def __init__(self, path, max_entries=MCQ_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._store = SQLiteLRUStore(path, "mcq_entries", max_entries, measure="entries", replaces=("mcqs",))
+
+    def get(self, key):
+        value = self._store.get(key)
+        return json.loads(value.decode("utf-8")) if value is not None else None
+
+    def put(self, key, mcq):
+        self._store.put(key, json.dumps(mcq, ensure_ascii=False).encode("utf-8"))
+
+    def stats(self):
+        stats = self._store.stats()
+        return {**{k: stats[k] for k in ("hits", "misses", "hit_rate", "entries")}, "max_entries": self.max_entries}
+
+
+# One cache per process, used by every session's MCQ generation
+default_cache = MCQCache(MCQ_CACHE_PATH) if MCQ_CACHE_PATH else None
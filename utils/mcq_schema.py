@@ -0,0 +1,127 @@
+import ast
+import json
+import re
+
+OPTION_COUNT = 4
+
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+# "B", "B)", "(B)", "B." or "Option B" as an answer that names an option by its letter
+_LETTER_RE = re.compile(r"^\s*(?:option\s+)?\(?([A-Da-d])[).:]?\s*$", re.IGNORECASE)
+# "A) Mitosis" / "b. Mitosis" labels some models put in front of every option
+_LABEL_RE = re.compile(r"^\s*\(?[A-Da-d][).:]\s+")
+
+OPTION_COUNT_ERROR = f'"options" must be a list of exactly {OPTION_COUNT} strings'
+EMPTY_OPTION_ERROR = 'every option must be a non-empty string'
+DUPLICATE_OPTION_ERROR = f'the {OPTION_COUNT} options must all be different'
+# Problems with the distractors alone: the question and answer are still usable
+OPTION_ERRORS = (OPTION_COUNT_ERROR, EMPTY_OPTION_ERROR, DUPLICATE_OPTION_ERROR)
+
+
+def validate(item):
+    # Every problem with a parsed MCQ, worded so it can be sent back to the
+    # model as-is; an empty list means the MCQ is usable
+    if not isinstance(item, dict):
+        return ["the response is not a JSON object with question, options and answer"]
+    errors = []
+    question = item.get("question")
+    if not isinstance(question, str) or not question.strip():
+        errors.append('"question" must be a non-empty string')
+    options = item.get("options")
+    if not isinstance(options, list) or len(options) != OPTION_COUNT:
+        errors.append(OPTION_COUNT_ERROR)
+    elif not all(isinstance(o, str) and o.strip() for o in options):
+        errors.append(EMPTY_OPTION_ERROR)
+    elif len({o.strip().lower() for o in options}) != OPTION_COUNT:
+        errors.append(DUPLICATE_OPTION_ERROR)
+    answer = item.get("answer")
+    if not isinstance(answer, str) or not answer.strip():
+        errors.append('"answer" must be a non-empty string')
+    elif not isinstance(options, list) or answer not in options:
+        errors.append('"answer" must be exactly one of the options')
+    return errors
+
+
+def _json_span(text):
+    # The first balanced {...} or [...] in text, ignoring brackets inside strings
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def parse_response(content):
+    # Cheap local JSON repair: smart quotes, code fences, text around the
+    # JSON, trailing commas and Python-style single quotes. Returns the parsed
+    # value or None when nothing parseable is left.
+    if not isinstance(content, str):
+        return None
+    text = _FENCE_RE.sub("", content.translate(_SMART_QUOTES)).strip()
+    candidates = [text]
+    span = _json_span(text)
+    if span is not None and span != text:
+        candidates.append(span)
+    for candidate in candidates:
+        for attempt in (candidate, _TRAILING_COMMA_RE.sub(r"\1", candidate)):
+            try:
+                return json.loads(attempt)
+            except ValueError:
+                pass
+            try:
+                value = ast.literal_eval(attempt)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                continue
+            if isinstance(value, (dict, list)):
+                return value
+    return None
+
+
+def normalize(item):
+    # Local fixes for near-misses: padded strings, {"A": ..., "B": ...}
+    # options, "A) " option labels and answers given as a letter or with
+    # different case/spacing. Anything else is left for validate() to report.
+    if not isinstance(item, dict):
+        return item
+    item = dict(item)
+    options = item.get("options")
+    if isinstance(options, dict):
+        options = list(options.values())
+    if isinstance(options, list):
+        options = [o.strip() if isinstance(o, str) else o for o in options]
+        if all(isinstance(o, str) and _LABEL_RE.match(o) for o in options):
+            options = [_LABEL_RE.sub("", o, count=1) for o in options]
+        item["options"] = options
+    for key in ("question", "answer"):
+        if isinstance(item.get(key), str):
+            item[key] = item[key].strip()
+
+    answer = item.get("answer")
+    if isinstance(options, list) and isinstance(answer, str) and answer not in options:
+        strings = [o if isinstance(o, str) else "" for o in options]
+        folded = [o.casefold() for o in strings]
+        unlabeled = _LABEL_RE.sub("", answer, count=1).casefold()
+        letter = _LETTER_RE.match(answer)
+        if unlabeled in folded:
+            item["answer"] = strings[folded.index(unlabeled)]
+        elif letter is not None and "abcd".index(letter.group(1).lower()) < len(strings):
+            item["answer"] = strings["abcd".index(letter.group(1).lower())]
+    return item
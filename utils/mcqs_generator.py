@@ -1,8 +1,15 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 import openai
 from dotenv import load_dotenv
 import streamlit as st
+from utils import mcq_cache, mcq_schema
+from utils.chunker import chunk_text, select_chunks
+from utils.cloze_generator import document_model
+from utils.dedup import NearDuplicateIndex, question_text
+from utils.generation_backends import get_backend
 
 # Load .env for local use
 load_dotenv()
@@ -10,9 +17,31 @@ load_dotenv()
 # Prioritize Streamlit Cloud secrets over .env
 openai.api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
 
+# Max LLM requests in flight while generating one quiz
+MCQ_CONCURRENCY = int(os.getenv("MCQ_CONCURRENCY", "4"))
 
-def generate_question_answer(text_chunk, retries=2):
-    prompt = f"""
+# Chunks sent together in one request; 1 sends every chunk on its own
+MCQ_BATCH_SIZE = int(os.getenv("MCQ_BATCH_SIZE", "5"))
+
+# Extra generation rounds for slots whose question was a near-duplicate
+MCQ_DEDUP_ROUNDS = int(os.getenv("MCQ_DEDUP_ROUNDS", "2"))
+
+# Part of the MCQ cache key; bump whenever a prompt changes
+PROMPT_VERSION = "3"
+
+FALLBACK_MCQ = {
+    "question": "Could not generate question.",
+    "options": ["A", "B", "C", "D"],
+    "answer": "A"
+}
+
+
+def _chat(prompt, max_tokens):
+    return get_backend().complete(prompt, max_tokens)
+
+
+def _single_prompt(text_chunk):
+    return f"""
 Generate one multiple choice question based on the following text:
 
 \"\"\"{text_chunk}\"\"\"
@@ -28,65 +57,366 @@ Return the response ONLY as a JSON object like this:
 No explanation. Only JSON.
 """
 
-    for _ in range(retries):
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=300
-            )
-
-            content = response.choices[0].message.content.strip()
-
-            cleaned = (
-                content
-                .replace("“", "\"")
-                .replace("”", "\"")
-                .replace("‘", "'")
-                .replace("’", "'")
-                .strip("```json")
-                .strip("```")
-                .strip()
-            )
-
-            parsed = json.loads(cleaned)
-            return parsed
 
+def _answer_aware_prompt(text_chunk, answer):
+    return f"""
+Read the text and write one question whose answer is "{answer}".
+
+Text: {text_chunk}
+
+Question:"""
+
+
+def _answer_aware_mcq(question, cloze):
+    # The local model's question with the cloze answer and options; the cloze
+    # question itself when the model's output is empty or gives the answer away
+    question = question.strip()
+    if not question or cloze["answer"].lower() in question.lower():
+        return cloze
+    if not question.endswith("?"):
+        question += "?"
+    return {**cloze, "question": question}
+
+
+def _local_questions(text_chunks, document=None):
+    # Seq2seq models like flan-t5 can't write the JSON the API prompt asks for
+    # (T5's vocabulary has no braces), so nothing is parsed or sent back for a
+    # fix. The answer and options come from the document's term model, as for a
+    # cloze question, and one batched generate() only writes each question.
+    model = document_model(document or text_chunks)
+    clozes = [model.cloze_for_chunk(chunk) for chunk in text_chunks]
+    asked = [i for i, cloze in enumerate(clozes) if cloze is not None]
+    outputs = get_backend().complete_many(
+        [_answer_aware_prompt(text_chunks[i], clozes[i]["answer"]) for i in asked], max_tokens=64
+    ) if asked else []
+    mcqs = [dict(FALLBACK_MCQ) for _ in text_chunks]
+    for i, output in zip(asked, outputs):
+        mcqs[i] = _answer_aware_mcq(output, clozes[i])
+        _store_mcq(text_chunks[i], mcqs[i])
+    return mcqs
+
+
+def _is_valid_mcq(item):
+    return not mcq_schema.validate(item)
+
+
+def _has_weak_options(mcq):
+    # The question and answer are usable and the answer is one of the options,
+    # but there are too few or too many options, or some are empty or repeated.
+    # An answer missing from the options is not weak: topping those up would
+    # add the answer next to an option that may already say the same thing.
+    errors = mcq_schema.validate(mcq)
+    return bool(errors) and all(error in mcq_schema.OPTION_ERRORS for error in errors)
+
+
+def _fix_prompt(content, errors):
+    problems = "\n".join(f"- {error}" for error in errors)
+    return f"""
+This multiple choice question JSON has problems:
+
+{content}
+
+Problems:
+{problems}
+
+Return ONLY the corrected JSON object with "question", "options" (4 different strings) and "answer" (exactly one of the options).
+
+No explanation. Only JSON.
+"""
+
+
+def _repaired(content, retries, keep_weak=False):
+    # Strict validation with the cheapest fix first: local JSON and field
+    # repair, then up to `retries` short requests that send back only the
+    # broken JSON and its problems (not the passage). With keep_weak, weak
+    # options are left for the document-level top-up in generate_mcqs().
+    # Returns None on failure.
+    for attempt in range(retries + 1):
+        item = mcq_schema.parse_response(content) if isinstance(content, str) else content
+        if isinstance(item, list) and len(item) == 1:
+            item = item[0]
+        item = mcq_schema.normalize(item)
+        errors = mcq_schema.validate(item)
+        if not errors or (keep_weak and _has_weak_options(item)):
+            return item
+        if attempt == retries:
+            break
+        shown = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+        try:
+            content = _chat(_fix_prompt(shown, errors), max_tokens=300)
         except Exception:
-            continue  # retry silently
-
-    return {
-        "question": "Could not generate question.",
-        "options": ["A", "B", "C", "D"],
-        "answer": "A"
-    }
-
-
-def generate_mcqs(text, num_questions=3):
-    sentences = [s.strip() for s in text.split('.') if len(s.strip()) > 20]
-
-    if not sentences:
-        return [{
-            "question": "No valid content found in PDF to generate questions.",
-            "options": ["A", "B", "C", "D"],
-            "answer": "A"
-        }]
-
-    chunks = []
-    chunk = ""
-    for sentence in sentences:
-        if len(chunk) + len(sentence) < 500:
-            chunk += sentence + ". "
-        else:
-            chunks.append(chunk.strip())
-            chunk = sentence + ". "
-    if chunk:
-        chunks.append(chunk.strip())
+            break
+    return None
+
+
+def _cache_key(text_chunk):
+    backend = get_backend()
+    return mcq_cache.cache_key(
+        text_chunk, backend.model_name, PROMPT_VERSION, f"temperature={backend.temperature}"
+    )
+
+
+def _cached_mcq(text_chunk):
+    cache = mcq_cache.default_cache
+    return cache.get(_cache_key(text_chunk)) if cache is not None else None
+
+
+def _store_mcq(text_chunk, mcq):
+    cache = mcq_cache.default_cache
+    if cache is not None:
+        cache.put(_cache_key(text_chunk), mcq)
+
+
+def _finish(text_chunk, content, retries, keep_weak=False):
+    # A valid MCQ (cached for next time) or FALLBACK_MCQ; with keep_weak, an
+    # MCQ with weak options may also be returned for _local_repair() to top up
+    item = _repaired(content, retries, keep_weak)
+    if item is None:
+        return dict(FALLBACK_MCQ)
+    if _is_valid_mcq(item):
+        _store_mcq(text_chunk, item)
+    return item
+
+
+def generate_question_answer(text_chunk, retries=2, use_cache=True, keep_weak=False):
+    # ♻️ Identical chunks skip the LLM entirely
+    cached = _cached_mcq(text_chunk) if use_cache else None
+    if cached is not None:
+        return cached
+    if get_backend().batched_inference:
+        return _local_questions([text_chunk])[0]
+
+    try:
+        # Rate limits and brief outages are retried with backoff inside the backend
+        content = _chat(_single_prompt(text_chunk), max_tokens=300)
+    except Exception:
+        return dict(FALLBACK_MCQ)
+    return _finish(text_chunk, content, retries, keep_weak)
+
+
+def generate_question_answers_batch(text_chunks, retries=2, keep_weak=False, document=None):
+    # One request for several chunks: the model returns a JSON array with one
+    # MCQ per passage, each naming its passage number. Each item is repaired on
+    # its own (see _repaired()); only passages missing from the response are
+    # generated again one by one.
+    # `document` is every chunk of the text, for local models' options.
+    mcqs = [_cached_mcq(chunk) for chunk in text_chunks]
+    pending = [i for i, mcq in enumerate(mcqs) if mcq is None]
+
+    if get_backend().batched_inference and pending:
+        # Local models answer every pending chunk in one batched generate()
+        for i, mcq in zip(pending, _local_questions([text_chunks[i] for i in pending], document)):
+            mcqs[i] = mcq
+        return mcqs
 
-    mcqs = []
-    for chunk in chunks[:num_questions]:
-        qa = generate_question_answer(chunk)
-        mcqs.append(qa)
+    if len(pending) <= 1:
+        for i in pending:
+            mcqs[i] = generate_question_answer(text_chunks[i], retries=retries, use_cache=False, keep_weak=keep_weak)
+        return mcqs
+    text_chunks = [text_chunks[i] for i in pending]
 
+    passages = "\n\n".join(
+        f"Passage {i}:\n\"\"\"{chunk}\"\"\"" for i, chunk in enumerate(text_chunks, 1)
+    )
+    prompt = f"""
+Generate one multiple choice question for each of the {len(text_chunks)} passages below.
+
+{passages}
+
+Return the response ONLY as a JSON array with exactly {len(text_chunks)} objects, in passage order, each like this:
+
+{{
+  "passage": 1,
+  "question": "Your question here",
+  "options": ["Option A", "Option B", "Option C", "Option D"],
+  "answer": "Correct answer text from options"
+}}
+
+No explanation. Only JSON.
+"""
+
+    try:
+        parsed = mcq_schema.parse_response(_chat(prompt, max_tokens=300 * len(text_chunks)))
+    except Exception:
+        parsed = None
+    items = _items_by_passage(parsed if isinstance(parsed, list) else [], len(text_chunks))
+
+    for position, (i, chunk) in enumerate(zip(pending, text_chunks)):
+        if position in items:
+            mcqs[i] = _finish(chunk, items[position], retries, keep_weak)
+        else:
+            mcqs[i] = generate_question_answer(chunk, retries=retries, use_cache=False, keep_weak=keep_weak)
     return mcqs
+
+
+def _items_by_passage(items, count):
+    # {0-based passage: item} from the "passage" number each item echoes, so a
+    # skipped or merged passage can't shift later questions onto the wrong
+    # chunk (and into the cache under its key). Unnumbered items are only
+    # matched by position when there is exactly one per passage.
+    numbered = {}
+    for item in items:
+        number = item.get("passage") if isinstance(item, dict) else None
+        if isinstance(number, str) and number.strip().isdigit():
+            number = int(number)
+        if isinstance(number, int) and not isinstance(number, bool) and 1 <= number <= count:
+            numbered.setdefault(number - 1, {k: v for k, v in item.items() if k != "passage"})
+    if numbered:
+        return numbered
+    return dict(enumerate(items)) if len(items) == count else {}
+
+
+NO_CONTENT_MCQ = {
+    "question": "No valid content found in PDF to generate questions.",
+    "options": ["A", "B", "C", "D"],
+    "answer": "A"
+}
+
+
+def _batches(chunks, num_questions, batch_size):
+    # Chunks are picked across the whole document, not just its first pages
+    selected = select_chunks(chunks, num_questions)
+    if get_backend().batched_inference:
+        # One batch lets the local model pad and run every chunk together
+        batch_size = len(selected)
+    batch_size = max(1, batch_size)
+    return [selected[i:i + batch_size] for i in range(0, len(selected), batch_size)]
+
+
+def _generate_batch(batch, document):
+    # Quiz batches keep weak options; _local_repair() tops them up or replaces them
+    return generate_question_answers_batch(batch, keep_weak=True, document=document)
+
+
+def _is_fallback(mcq):
+    return mcq.get("question") == FALLBACK_MCQ["question"]
+
+
+def _local_repair(chunks):
+    # Replaces "Could not generate question." placeholders with rule-based
+    # cloze questions and tops up weak options with the answer's nearest
+    # neighbours from the document, instead of asking the model again. The
+    # document model is only built (or fetched from its cache) when needed.
+    model = None
+
+    def apply(batch, mcqs):
+        nonlocal model
+        for i, mcq in enumerate(mcqs):
+            fallback, weak = _is_fallback(mcq), _has_weak_options(mcq)
+            if (fallback or weak) and model is None:
+                model = document_model(chunks)
+            if fallback:
+                mcqs[i] = model.cloze_for_chunk(batch[i]) or mcq
+            elif weak:
+                options = mcq.get("options")
+                options = model.options_for(mcq["answer"], keep=options if isinstance(options, list) else ())
+                repaired = {**mcq, "options": options}
+                if not _is_valid_mcq(repaired):
+                    # A question that still fails validation isn't shown to students
+                    repaired = model.cloze_for_chunk(batch[i]) or dict(FALLBACK_MCQ)
+                mcqs[i] = repaired
+        return mcqs
+
+    return apply
+
+
+def _deduplicator(existing):
+    # accept(mcq) is False for near-duplicates of an MCQ accepted earlier or
+    # of the teacher's question bank (`existing`, a NearDuplicateIndex or None).
+    # Placeholders are always accepted; they are reported, not deduplicated.
+    generated = NearDuplicateIndex()
+
+    def accept(mcq):
+        if _is_fallback(mcq):
+            return True
+        text = question_text(mcq)
+        if generated.query(text) or (existing is not None and existing.query(text)):
+            return False
+        generated.add(len(generated), text)
+        return True
+
+    return accept
+
+
+def _replacements(chunks, used, count, accept, fallback, max_workers, batch_size):
+    # (chunk, mcq) for the rejected slots, regenerated from chunks no question
+    # came from yet; gives up after MCQ_DEDUP_ROUNDS rounds or when the text runs out
+    spare = [chunk for chunk in chunks if chunk not in used]
+    for _ in range(MCQ_DEDUP_ROUNDS):
+        if count <= 0 or not spare:
+            return
+        batches = _batches(spare, count, batch_size)
+        picked = {chunk for batch in batches for chunk in batch}
+        spare = [chunk for chunk in spare if chunk not in picked]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            for batch, result in zip(batches, executor.map(partial(_generate_batch, document=chunks), batches)):
+                for chunk, mcq in zip(batch, fallback(batch, result)):
+                    if count > 0 and accept(mcq):
+                        count -= 1
+                        yield chunk, mcq
+
+
+def generate_mcqs(text, num_questions=3, max_workers=MCQ_CONCURRENCY, batch_size=MCQ_BATCH_SIZE, existing=None):
+    chunks = chunk_text(text, model=get_backend().model_name)
+    batches = _batches(chunks, num_questions, batch_size)
+    if not batches:
+        return [dict(NO_CONTENT_MCQ)]
+    fallback = _local_repair(chunks)
+    accept = _deduplicator(existing)
+
+    # Each batch keeps its own retries; map() returns results in chunk order
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        results = executor.map(partial(_generate_batch, document=chunks), batches)
+        mcqs = [mcq for batch, result in zip(batches, results) for mcq in fallback(batch, result)]
+
+    # Near-duplicates keep their position and are refilled from unused chunks;
+    # slots that can't be refilled are dropped
+    kept = [mcq if accept(mcq) else None for mcq in mcqs]
+    if None in kept:
+        used = {chunk for batch in batches for chunk in batch}
+        refill = _replacements(chunks, used, kept.count(None), accept, fallback, max_workers, batch_size)
+        kept = [mcq if mcq is not None else next(refill, (None, None))[1] for mcq in kept]
+    return [mcq for mcq in kept if mcq is not None]
+
+
+def iter_mcqs(text, num_questions=3, max_workers=MCQ_CONCURRENCY, batch_size=MCQ_BATCH_SIZE, existing=None):
+    # Same work as generate_mcqs(), but yields each MCQ as soon as its request
+    # finishes (completion order) so the UI can show questions incrementally.
+    # Near-duplicates are skipped and their replacements come last. Each MCQ
+    # carries the position of its chunk in the text as "chunk_index", so
+    # in_document_order() can restore chunk order once the stream is done.
+    chunks = chunk_text(text, model=get_backend().model_name)
+    batches = _batches(chunks, num_questions, batch_size)
+    if not batches:
+        yield dict(NO_CONTENT_MCQ)
+        return
+    fallback = _local_repair(chunks)
+    accept = _deduplicator(existing)
+    order = {chunk: i for i, chunk in reversed(list(enumerate(chunks)))}
+    rejected = 0
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches))))
+    try:
+        futures = {executor.submit(_generate_batch, batch, chunks): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            for chunk, mcq in zip(batch, fallback(batch, future.result())):
+                if accept(mcq):
+                    yield {**mcq, "chunk_index": order[chunk]}
+                else:
+                    rejected += 1
+    finally:
+        # Don't start batches nobody will read if the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if rejected:
+        used = {chunk for batch in batches for chunk in batch}
+        for chunk, mcq in _replacements(chunks, used, rejected, accept, fallback, max_workers, batch_size):
+            yield {**mcq, "chunk_index": order[chunk]}
+
+
+def in_document_order(mcqs):
+    # MCQs streamed by iter_mcqs() sorted by the chunk they came from, without
+    # the "chunk_index" tag so it is never saved with the quiz
+    ordered = sorted(mcqs, key=lambda mcq: mcq.get("chunk_index", 0))
+    return [{k: v for k, v in mcq.items() if k != "chunk_index"} for mcq in ordered]
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import zlib
+
+from utils.sqlite_lru import SQLiteLRUStore
+
+# Empty PDF_CACHE_PATH disables the cache
+PDF_CACHE_PATH = os.getenv(
+    "PDF_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "quiz_runner", "pdf_text.sqlite3")
+)
+# Upper bound on the compressed page texts kept on disk
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Part of the cache key; bump whenever extraction output changes
+EXTRACTOR_VERSION = "2"
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(uploaded_file):
+    # Hex digest of the file's bytes, read in blocks; file objects are rewound
+    # before and after so the upload can still be read normally
+    digest = hashlib.sha256()
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def cache_key(file_digest, extractor_version=EXTRACTOR_VERSION, **options):
+    # Same bytes + same extraction code and options give the same pages
+    payload = json.dumps([file_digest, extractor_version, sorted(options.items())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PDFTextCache:
+    # Persistent SQLite store of zlib-compressed page texts, evicted
+    # least-recently-used first once the total size passes max_bytes
+
+    def __init__(self, path, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._store = SQLiteLRUStore(path, "pdf_text", max_bytes, measure="bytes", replaces=("pdf_pages",))
+
+    def get(self, key):
+        value = self._store.get(key)
+        return json.loads(zlib.decompress(value).decode("utf-8")) if value is not None else None
+
+    def put(self, key, pages):
+        self._store.put(key, zlib.compress(json.dumps(list(pages), ensure_ascii=False).encode("utf-8")))
+
+    def stats(self):
+        return {**self._store.stats(), "max_bytes": self.max_bytes}
+
+
+# Extracted pages of any upload are reused by whichever session opens the same file next
+default_cache = PDFTextCache(PDF_CACHE_PATH) if PDF_CACHE_PATH else None
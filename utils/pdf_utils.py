@@ -1,8 +1,197 @@
-import fitz 
-
-def extract_text_from_pdf(uploaded_file):
-    with fitz.open(stream=uploaded_file.read(), filetype="pdf") as doc:
-        text = ""
-        for page in doc:
-            text += page.get_text()
-    return text
\ No newline at end of file
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import fitz
+
+from utils import pdf_cache
+from utils.boilerplate import strip_boilerplate
+
+# Bytes copied per read while spooling an upload to disk
+SPOOL_BLOCK_SIZE = 1 << 20
+
+# Documents with at least this many pages are extracted by a process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "150"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+MIN_PAGES_PER_TASK = 10
+
+# Top and bottom share of the page height where running headers and footers sit
+MARGIN_FRACTION = 0.1
+
+
+@contextmanager
+def spooled_pdf(uploaded_file):
+    # Path to the PDF on disk. Uploads are copied block by block to a temp
+    # file so fitz opens it by path and loads pages on demand, instead of
+    # getting the whole file as one bytes object. The temp file is removed on exit.
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        yield os.fspath(uploaded_file)
+        return
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            if hasattr(uploaded_file, "seek"):
+                uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, spool, SPOOL_BLOCK_SIZE)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # One pool per process, shared by every session. Workers are spawned, not
+    # forked, since the Streamlit server process is multi-threaded.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def page_lines(page):
+    # [(zone, line)] from fitz's text blocks in reading order; zone is "top",
+    # "bottom" or "body" depending on where the block sits on the page
+    height = page.rect.height
+    lines = []
+    for _, y0, _, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0:  # image block
+            continue
+        if y1 <= height * MARGIN_FRACTION:
+            zone = "top"
+        elif y0 >= height * (1 - MARGIN_FRACTION):
+            zone = "bottom"
+        else:
+            zone = "body"
+        lines.extend((zone, line) for line in text.splitlines() if line.strip())
+    return lines
+
+
+def _extract_range(path, start, stop):
+    # Runs in a worker process: each worker opens the spooled file itself
+    with fitz.open(path) as doc:
+        return [page_lines(doc[i]) for i in range(start, stop)]
+
+
+def page_ranges(page_count, workers):
+    # About four ranges per worker so a slow range doesn't leave the others idle
+    size = max(MIN_PAGES_PER_TASK, -(-page_count // (workers * 4)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _clamp(page_range, page_count):
+    # (start, stop) as 0-based, half-open page numbers within the document
+    if page_range is None:
+        return 0, page_count
+    start, stop = page_range
+    start = min(max(0, start), page_count)
+    return start, min(max(start, stop), page_count)
+
+
+def iter_page_lines(uploaded_file, parallel=None, page_range=None):
+    # page_lines() of each page in page_range (0-based start, stop; the whole
+    # document by default), one page at a time in page order. Pages outside
+    # the range are never loaded. parallel=None decides by page count; with a
+    # pool, CPU-bound extraction runs outside this process so it doesn't hold
+    # the GIL other sessions need, and only finished ranges are held in memory.
+    with spooled_pdf(uploaded_file) as path, fitz.open(path) as doc:
+        start, stop = _clamp(page_range, doc.page_count)
+        if parallel is None:
+            parallel = PDF_WORKERS > 1 and stop - start >= PDF_PARALLEL_MIN_PAGES
+        done = start
+        if parallel:
+            ranges = [(start + a, start + b) for a, b in page_ranges(stop - start, PDF_WORKERS)]
+            try:
+                results = _get_pool().map(_extract_range, *zip(*[(path, a, b) for a, b in ranges]))
+                for pages in results:
+                    for lines in pages:
+                        yield lines
+                        done += 1
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory): finish the remaining
+                # pages here and start a fresh pool next time
+                _reset_pool()
+        for number in range(done, stop):
+            yield page_lines(doc[number])
+
+
+def iter_page_texts(uploaded_file, parallel=None, page_range=None):
+    # Raw page texts (no boilerplate stripping), one page at a time
+    for lines in iter_page_lines(uploaded_file, parallel, page_range):
+        yield "".join(f"{text}\n" for _, text in lines)
+
+
+def chapters_from_toc(toc, page_count):
+    # [(title, start, stop)] with 0-based, half-open page ranges for the
+    # highest outline level that splits the document into several parts
+    # (a lone top-level entry is usually the book title)
+    levels = sorted({level for level, _, _ in toc})
+    chapters = []
+    for level in levels:
+        entries = [
+            (title.strip(), page - 1) for entry_level, title, page in toc
+            if entry_level == level and 1 <= page <= page_count
+        ]
+        chapters = []
+        for i, (title, start) in enumerate(entries):
+            stop = entries[i + 1][1] if i + 1 < len(entries) else page_count
+            if stop > start:
+                chapters.append((title, start, stop))
+        if len(chapters) > 1:
+            break
+    return chapters
+
+
+def read_outline(uploaded_file):
+    # Page count and chapters from the PDF outline; no page text is extracted
+    with spooled_pdf(uploaded_file) as path, fitz.open(path) as doc:
+        page_count = doc.page_count
+        toc = doc.get_toc(simple=True)
+    return {"page_count": page_count, "chapters": chapters_from_toc(toc, page_count)}
+
+
+def extract_pages(uploaded_file, page_range=None):
+    # ♻️ Page lines of a PDF seen before come from the on-disk cache, keyed by
+    # the SHA-256 of its bytes and the page range, without opening it in fitz
+    cache = pdf_cache.default_cache
+    if cache is None:
+        return list(iter_page_lines(uploaded_file, page_range=page_range))
+    options = {} if page_range is None else {"page_range": list(page_range)}
+    key = pdf_cache.cache_key(pdf_cache.file_sha256(uploaded_file), **options)
+    pages = cache.get(key)
+    if pages is None:
+        pages = list(iter_page_lines(uploaded_file, page_range=page_range))
+        cache.put(key, pages)
+    return pages
+
+
+def extract_text_with_report(uploaded_file, page_range=None):
+    # (text, report): running headers, footers, page numbers and contents
+    # pages are removed before the text reaches chunking and the LLM; the
+    # report says how many characters and tokens that saved
+    texts, report = strip_boilerplate(extract_pages(uploaded_file, page_range))
+    # One join at the end instead of repeated string concatenation
+    return "".join(texts), report
+
+
+def extract_text_from_pdf(uploaded_file, page_range=None):
+    return extract_text_with_report(uploaded_file, page_range)[0]
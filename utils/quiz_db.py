@@ -1,19 +1,28 @@
-import firebase_admin
 from firebase_admin import firestore
-from datetime import datetime
+from datetime import datetime, timezone
+from firebaseConfig import get_db
+from utils import repository
+
+def to_utc_datetime(value):
+    # Quizzes store start_time/end_time as Firestore Timestamps; older documents
+    # hold ISO-8601 strings instead. Naive values are treated as UTC.
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
 
 def create_quiz(teacher_id, quiz_title, questions, start_time, end_time):
-    # Initialize Firestore client inside the function to avoid init on import
-    db = firestore.client()
+    db = get_db()
 
     quiz_doc = {
         "teacher_id": teacher_id,
         "title": quiz_title,
         "questions": questions,
-        "start_time": firestore.SERVER_TIMESTAMP if start_time is None else start_time,
-        "end_time": firestore.SERVER_TIMESTAMP if end_time is None else end_time,
+        "start_time": firestore.SERVER_TIMESTAMP if start_time is None else to_utc_datetime(start_time),
+        "end_time": firestore.SERVER_TIMESTAMP if end_time is None else to_utc_datetime(end_time),
         "duration": (end_time - start_time).total_seconds() // 60,
         "created_at": datetime.utcnow()
     }
-    quiz_ref = db.collection("quizzes").add(quiz_doc)
+    quiz_ref = repository.add_quiz(db, quiz_doc)
     return quiz_ref
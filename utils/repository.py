@@ -0,0 +1,334 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.batch_writer import bulk_write, delete_op, update_op
+from utils.user_db import GET_ALL_CHUNK_SIZE, get_users_by_ids
+
+# A query result as returned by the repository: (document_id, document_dict)
+Record = Tuple[str, Dict[str, Any]]
+
+_MISSING = object()
+
+
+class TTLCache:
+    # Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    def __init__(self, maxsize=2048, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def peek(self, key, default=None):
+        # Read without touching LRU order or the hit/miss counters
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+# ✅ Shared by every session served from this process
+_cache = TTLCache(
+    maxsize=int(os.getenv("QUIZ_RUNNER_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("QUIZ_RUNNER_CACHE_TTL", "30")),
+)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def _cached(key, loader):
+    value = _cache.get(key)
+    if value is _MISSING:
+        value = loader()
+        _cache.set(key, value)
+    return value
+
+
+def _records(query) -> List[Record]:
+    return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+
+# ---------- Users ----------
+
+def get_user(db, uid: str) -> Optional[Dict[str, Any]]:
+    def load():
+        doc = db.collection("users").document(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+    return _cached(("user", uid), load)
+
+
+def get_users(db, uids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    users = {}
+    misses = []
+    for uid in dict.fromkeys(uid for uid in uids if uid):
+        cached = _cache.get(("user", uid))
+        if cached is _MISSING:
+            misses.append(uid)
+        elif cached is not None:
+            users[uid] = cached
+
+    if misses:
+        fetched = get_users_by_ids(db, misses)
+        for uid in misses:
+            _cache.set(("user", uid), fetched.get(uid))
+        users.update(fetched)
+    return users
+
+
+def list_teachers(db) -> List[Record]:
+    return _cached(("teachers",), lambda: _records(db.collection("users").where("role", "==", "Teacher")))
+
+
+def list_students_for_teacher(db, teacher_id: str) -> List[Record]:
+    return _cached(
+        ("students", teacher_id),
+        lambda: _records(db.collection("users").where("teacher_id", "==", teacher_id)),
+    )
+
+
+def _invalidate_user(uid, *teacher_ids):
+    previous = _cache.peek(("user", uid)) or {}
+    _cache.invalidate(
+        ("user", uid),
+        ("teachers",),
+        ("students", previous.get("teacher_id")),
+        *(("students", tid) for tid in teacher_ids),
+    )
+
+
+def create_user(db, uid: str, data: Dict[str, Any]) -> None:
+    db.collection("users").document(uid).set(data)
+    _invalidate_user(uid, data.get("teacher_id"))
+
+
+def update_user(db, uid: str, changes: Dict[str, Any]) -> None:
+    db.collection("users").document(uid).update(changes)
+    _invalidate_user(uid, changes.get("teacher_id"))
+
+
+# ---------- Quizzes ----------
+
+# List views only need these; the questions array is loaded per quiz on demand
+QUIZ_SUMMARY_FIELDS = ["teacher_id", "title", "start_time", "end_time", "duration", "created_at"]
+
+
+def list_quizzes_for_teacher(db, teacher_id: str) -> List[Record]:
+    return _cached(
+        ("quizzes", teacher_id),
+        lambda: _records(
+            db.collection("quizzes")
+            .where("teacher_id", "==", teacher_id)
+            .select(QUIZ_SUMMARY_FIELDS)
+        ),
+    )
+
+
+def get_quiz_questions(db, quiz_id: str) -> List[Dict[str, Any]]:
+    def load():
+        doc = db.collection("quizzes").document(quiz_id).get(field_paths=["questions"])
+        return (doc.to_dict() or {}).get("questions", []) if doc.exists else []
+
+    return _cached(("quiz_questions", quiz_id), load)
+
+
+def get_questions_for_quizzes(db, quiz_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    # {quiz_id: questions} with one get_all() per chunk. Feeds near-duplicate
+    # detection, which keeps its own index, so the questions bypass _cache
+    # instead of evicting every other session's entries.
+    questions = {}
+    quiz_ids = list(dict.fromkeys(quiz_ids))
+    for start in range(0, len(quiz_ids), GET_ALL_CHUNK_SIZE):
+        refs = [db.collection("quizzes").document(quiz_id) for quiz_id in quiz_ids[start:start + GET_ALL_CHUNK_SIZE]]
+        for doc in db.get_all(refs, field_paths=["questions"]):
+            questions[doc.id] = (doc.to_dict() or {}).get("questions", []) if doc.exists else []
+    return questions
+
+
+def list_open_quizzes_for_teacher(db, teacher_id: str, ends_after: datetime) -> List[Record]:
+    # Only quizzes whose end_time is at or after `ends_after`; needs the
+    # (teacher_id, end_time) composite index from firestore.indexes.json.
+    # The cutoff is rounded down to the minute so consecutive reruns share one entry.
+    cutoff = ends_after.replace(second=0, microsecond=0)
+    key = ("open_quizzes", teacher_id)
+    cached = _cache.get(key)
+    if cached is not _MISSING and cached[0] == cutoff:
+        return cached[1]
+
+    records = _records(
+        db.collection("quizzes")
+        .where("teacher_id", "==", teacher_id)
+        .where("end_time", ">=", cutoff)
+        .select(QUIZ_SUMMARY_FIELDS)
+    )
+    _cache.set(key, (cutoff, records))
+    return records
+
+
+def _invalidate_quizzes(teacher_id):
+    _cache.invalidate(("quizzes", teacher_id), ("open_quizzes", teacher_id))
+
+
+def add_quiz(db, quiz: Dict[str, Any]):
+    ref = db.collection("quizzes").add(quiz)
+    _invalidate_quizzes(quiz.get("teacher_id"))
+    return ref
+
+
+def delete_quizzes(db, teacher_id: str, quiz_ids: Iterable[str], progress=None) -> None:
+    quiz_ids = list(quiz_ids)
+    try:
+        bulk_write(db, (delete_op(db.collection("quizzes").document(qid)) for qid in quiz_ids), progress=progress)
+    finally:
+        # Batches committed before a failure are gone too; don't keep serving them
+        _invalidate_quizzes(teacher_id)
+        _cache.invalidate(*(("quiz_questions", quiz_id) for quiz_id in quiz_ids))
+
+
+# ---------- Results ----------
+
+def list_results_for_student(db, student_id: str) -> List[Record]:
+    return _cached(
+        ("results_by_student", student_id),
+        lambda: _records(db.collection("student_results").where("student_id", "==", student_id)),
+    )
+
+
+def list_results_for_quiz(db, quiz_id: str) -> List[Record]:
+    return _cached(
+        ("results_by_quiz", quiz_id),
+        lambda: _records(db.collection("student_results").where("quiz_id", "==", quiz_id)),
+    )
+
+
+def add_result(db, result: Dict[str, Any]):
+    ref = db.collection("student_results").add(result)
+    _cache.invalidate(
+        ("results_by_student", result.get("student_id")),
+        ("results_by_quiz", result.get("quiz_id")),
+    )
+    return ref
+
+
+def delete_results(db, results: Iterable[Record], progress=None) -> None:
+    results = list(results)
+    try:
+        bulk_write(
+            db,
+            (delete_op(db.collection("student_results").document(result_id)) for result_id, _ in results),
+            progress=progress,
+        )
+    finally:
+        # Batches committed before a failure are gone too; don't keep serving them
+        _cache.invalidate(*{
+            key
+            for _, result in results
+            for key in (("results_by_student", result.get("student_id")), ("results_by_quiz", result.get("quiz_id")))
+        })
+
+
+# ---------- Teacher registration requests ----------
+
+def list_pending_requests_for_student(db, student_id: str) -> List[Record]:
+    return _cached(
+        ("pending_by_student", student_id),
+        lambda: _records(
+            db.collection("teacher_requests")
+            .where("student_id", "==", student_id)
+            .where("status", "==", "pending")
+        ),
+    )
+
+
+def list_pending_requests_for_teacher(db, teacher_id: str) -> List[Record]:
+    return _cached(
+        ("pending_by_teacher", teacher_id),
+        lambda: _records(
+            db.collection("teacher_requests")
+            .where("teacher_id", "==", teacher_id)
+            .where("status", "==", "pending")
+        ),
+    )
+
+
+def _invalidate_requests(request):
+    _cache.invalidate(
+        ("pending_by_student", request.get("student_id")),
+        ("pending_by_teacher", request.get("teacher_id")),
+    )
+
+
+def add_teacher_request(db, request: Dict[str, Any]):
+    ref = db.collection("teacher_requests").add(request)
+    _invalidate_requests(request)
+    return ref
+
+
+def set_request_status(db, request_id: str, request: Dict[str, Any], status: str) -> None:
+    bulk_write(db, [update_op(db.collection("teacher_requests").document(request_id), {"status": status})])
+    _invalidate_requests(request)
+
+
+def accept_teacher_request(db, request_id: str, request: Dict[str, Any]) -> None:
+    # Both writes land in one batch so a student is never half-registered
+    bulk_write(db, [
+        update_op(db.collection("users").document(request["student_id"]), {"teacher_id": request["teacher_id"]}),
+        update_op(db.collection("teacher_requests").document(request_id), {"status": "accepted"}),
+    ])
+    _invalidate_user(request["student_id"], request["teacher_id"])
+    _invalidate_requests(request)
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteLRUStore:
+    # Persistent key -> bytes store in one SQLite table, evicted least-recently-
+    # used first once the entries pass `capacity`. measure="entries" counts
+    # entries, measure="bytes" counts the stored bytes. Callers encode values.
+
+    def __init__(self, path, table, capacity, measure="entries", replaces=()):
+        if measure not in ("entries", "bytes"):
+            raise ValueError(f"Unknown measure '{measure}'. Choose 'entries' or 'bytes'.")
+        self.path = path
+        self.table = table
+        self.capacity = capacity
+        self.measure = measure
+        # Tables of an older layout in the same file, dropped on first use
+        self.replaces = tuple(replaces)
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened on first use so importing a cache module never touches the disk
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            for table in self.replaces:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table} (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _size(self, value):
+        return len(value) if self.measure == "bytes" else 1
+
+    def get(self, key):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+        return bytes(row[0])
+
+    def put(self, key, value):
+        # A value bigger than the whole store is not kept
+        size = self._size(value)
+        if size > self.capacity:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            (total,) = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+            if total > self.capacity:
+                # Trim down to 90% so eviction doesn't run on every insert
+                excess = total - self.capacity * 9 // 10
+                evicted = []
+                for old_key, old_size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used"):
+                    if excess <= 0:
+                        break
+                    if old_key != key:
+                        evicted.append((old_key,))
+                        excess -= old_size
+                conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", evicted)
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connect().execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM {self.table}"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
@@ -0,0 +1,26 @@
+# Keep each multi-document fetch comfortably small so a single round trip never
+# carries an unbounded payload.
+GET_ALL_CHUNK_SIZE = 100
+
+
+def get_users_by_ids(db, uids, chunk_size=GET_ALL_CHUNK_SIZE):
+    # Resolve many user profiles with one get_all() per chunk instead of one
+    # document(...).get() per row. Returns {uid: user_dict} for existing users.
+    unique_ids = list(dict.fromkeys(uid for uid in uids if uid))
+    users = {}
+    for start in range(0, len(unique_ids), chunk_size):
+        refs = [db.collection("users").document(uid) for uid in unique_ids[start:start + chunk_size]]
+        for doc in db.get_all(refs):
+            if doc.exists:
+                users[doc.id] = doc.to_dict()
+    return users
+
+
+def student_snapshot(user):
+    # Name/email copied onto student_results and teacher_requests so the teacher
+    # views can render those rows without reading the users collection.
+    user = user or {}
+    return {
+        "student_name": user.get("name"),
+        "student_email": user.get("email"),
+    }